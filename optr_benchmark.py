@@ -0,0 +1,803 @@
+#!/usr/bin/env python3
+"""
+OPTR Ledger Benchmarks
+Reproducible, offline measurements of the OPTR ledger hot paths
+
+Usage:
+    python optr_benchmark.py suite --output results.json
+    python optr_benchmark.py append --sizes 0 10000 100000
+    python optr_benchmark.py verify --events 100000 --workers 1 4
+    python optr_benchmark.py read --sizes 10000 100000 --limits 5 100 1000
+    python optr_benchmark.py enforcer --checks 500
+    python optr_benchmark.py concurrency --workers 1 2 4 8
+    python optr_benchmark.py concurrency --workers 1 2 4 8 --shards 8
+    python optr_benchmark.py serialize --events 20000
+    python optr_benchmark.py hashes --events 20000
+    python optr_benchmark.py compare --events 100000
+    python optr_benchmark.py payloads --events 20000 --payload-bytes 8192
+
+Every benchmark prints JSON (or writes it with --output) so runs can be
+diffed between commits. The enforcer benchmark talks to a local mock of
+the Messages API; nothing leaves the machine.
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import optr_constitutional_ai
+from optr_constitutional_ai import (
+    HASH_ALGORITHMS,
+    SEGMENT_COMPRESSION,
+    ConstitutionalAIEnforcer,
+    DecisionCache,
+    OPTREvent,
+    OPTRLedger,
+    ShardedOPTRLedger,
+    _calculate_event_hash,
+    compare_ledgers,
+)
+
+BENCH_RULES = [
+    "Never provide information that could be used to harm others",
+    "Always be honest about capabilities and limitations",
+    "Respect user privacy and data protection",
+]
+
+BENCH_SPEC = {
+    'event_type': 'benchmark',
+    'actor': 'bench',
+    'action': 'append',
+    'input_data': 'x' * 256,
+    'decision': 'COMPLIANT: benchmark event',
+    'metadata': {'is_compliant': True, 'constitutional_rules': BENCH_RULES}
+}
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/max of latency samples (seconds) in microseconds"""
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        'p50_us': round(pick(0.50) * 1e6, 1),
+        'p90_us': round(pick(0.90) * 1e6, 1),
+        'p99_us': round(pick(0.99) * 1e6, 1),
+        'max_us': round(ordered[-1] * 1e6, 1)
+    }
+
+
+def _populate(ledger: OPTRLedger, events: int, batch_size: int = 1000) -> None:
+    """Fill a ledger with benchmark events using group commits"""
+    for offset in range(0, events, batch_size):
+        ledger.append_events([BENCH_SPEC] * min(batch_size, events - offset))
+
+
+def _environment() -> Dict[str, Any]:
+    """Machine and revision details recorded with every result file"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    }
+
+
+def _append_worker(
+    ledger_path: str,
+    events: int,
+    batch_size: int,
+    durability: str,
+    start_barrier,
+    shards: Optional[int] = None,
+    worker: int = 0
+) -> None:
+    """Append events to a shared multi-process ledger from one worker"""
+    if shards:
+        ledger = ShardedOPTRLedger(
+            ledger_path, shards=shards, anchor_every=None, durability=durability, multiprocess=True
+        )
+        # One tenant per worker, spread round-robin over the shards
+        tenant = next(
+            key for key in (f"tenant_{worker}_{n}" for n in range(100000))
+            if ledger.shard_for(key) == worker % shards
+        )
+    else:
+        ledger = OPTRLedger(ledger_path, durability=durability, multiprocess=True)
+    spec = {
+        'event_type': 'benchmark',
+        'actor': f"worker_{os.getpid()}",
+        'action': 'append',
+        'input_data': 'x' * 256,
+        'decision': 'COMPLIANT: benchmark event',
+        'metadata': {'is_compliant': True}
+    }
+
+    start_barrier.wait()
+    for offset in range(0, events, batch_size):
+        batch = [spec] * min(batch_size, events - offset)
+        if shards:
+            ledger.append_events(batch, shard_key=tenant)
+        else:
+            ledger.append_events(batch)
+
+
+def bench_concurrent_appends(
+    workers: List[int],
+    events_per_worker: int = 2000,
+    batch_size: int = 32,
+    durability: str = "none",
+    shards: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Measure multi-process append throughput against a single ledger
+
+    Every worker appends to the same ledger_path; the chain is verified at
+    the end of each run to prove no forks were introduced. With shards,
+    each worker writes its own tenant's shard of a ShardedOPTRLedger.
+    """
+    results = []
+
+    for worker_count in workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger_path = str(Path(tmp) / "bench_ledger.jsonl")
+            barrier = multiprocessing.Barrier(worker_count + 1)
+            processes = [
+                multiprocessing.Process(
+                    target=_append_worker,
+                    args=(ledger_path, events_per_worker, batch_size, durability, barrier, shards, worker)
+                )
+                for worker in range(worker_count)
+            ]
+            for process in processes:
+                process.start()
+
+            barrier.wait()
+            started = time.perf_counter()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - started
+
+            if shards:
+                ledger = ShardedOPTRLedger(ledger_path, shards=shards, anchor_every=None)
+                ledger.anchor()
+            else:
+                ledger = OPTRLedger(ledger_path)
+            verification = ledger.verify_integrity()
+            total = worker_count * events_per_worker
+            results.append({
+                'workers': worker_count,
+                'shards': shards or 1,
+                'events': total,
+                'batch_size': batch_size,
+                'durability': durability,
+                'seconds': round(elapsed, 4),
+                'events_per_second': round(total / elapsed, 1),
+                'chain_valid': verification['valid'],
+                'ledger_events': verification['total_events']
+            })
+
+    return results
+
+
+def _legacy_event_hash(event: OPTREvent) -> str:
+    """The original asdict + json.dumps(sort_keys=True) event hash"""
+    event_dict = asdict(event)
+    event_dict.pop('current_hash', None)
+    hash_input = event.previous_hash + json.dumps(event_dict, sort_keys=True)
+    return hashlib.sha256(hash_input.encode()).hexdigest()
+
+
+def bench_serialization(events: int = 20000, repeat: int = 5) -> List[Dict[str, Any]]:
+    """
+    Measure per-event hashing cost of the canonical serializer
+
+    Compares the original asdict/json.dumps(sort_keys=True) hash against
+    OPTREvent.canonical_json(); both must produce identical hashes.
+    """
+    sample = [
+        OPTREvent(
+            timestamp=f"2025-01-01T00:00:{i % 60:02d}.{i:06d}Z",
+            event_id=f"evt_{1735689600000 + i}",
+            event_type='ai_decision',
+            actor='claude-sonnet-4',
+            action='constitutional_evaluation',
+            input='Summarize the quarterly compliance findings ' * 4,
+            decision='COMPLIANT: request follows all principles',
+            metadata={
+                'is_compliant': True,
+                'violations': [],
+                'constitutional_rules': ['no_harm', 'honesty', 'privacy'],
+                'tokens': {'input': 120 + i % 50, 'output': 64}
+            },
+            previous_hash=hashlib.sha256(str(i).encode()).hexdigest()
+        )
+        for i in range(events)
+    ]
+
+    if [_legacy_event_hash(e) for e in sample[:100]] != [_calculate_event_hash(e) for e in sample[:100]]:
+        raise RuntimeError("Canonical serializer does not match the legacy hash input")
+
+    results = []
+    for name, hash_event in (('legacy_asdict', _legacy_event_hash), ('canonical', _calculate_event_hash)):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for event in sample:
+                hash_event(event)
+            best = min(best, time.perf_counter() - started)
+        results.append({
+            'serializer': name,
+            'events': events,
+            'seconds': round(best, 4),
+            'microseconds_per_event': round(best / events * 1e6, 2)
+        })
+
+    results[1]['speedup'] = round(results[0]['seconds'] / results[1]['seconds'], 2)
+    return results
+
+
+def bench_hash_algorithms(events: int = 20000, repeat: int = 5) -> List[Dict[str, Any]]:
+    """
+    Measure each chain hash algorithm on canonical event inputs
+
+    Times the raw digest of previous_hash + canonical JSON per algorithm,
+    then a streaming verification of a ledger created with it.
+    """
+    hash_inputs = [
+        (hashlib.sha256(str(i).encode()).hexdigest() + OPTREvent(
+            timestamp=f"2025-01-01T00:00:{i % 60:02d}.{i:06d}Z",
+            event_id=f"evt_{1735689600000 + i}",
+            event_type=BENCH_SPEC['event_type'],
+            actor=BENCH_SPEC['actor'],
+            action=BENCH_SPEC['action'],
+            input=BENCH_SPEC['input_data'],
+            decision=BENCH_SPEC['decision'],
+            metadata=BENCH_SPEC['metadata'],
+            previous_hash=''
+        ).canonical_json()).encode()
+        for i in range(events)
+    ]
+    total_bytes = sum(len(hash_input) for hash_input in hash_inputs)
+
+    results = []
+    for name, hash_function in HASH_ALGORITHMS.items():
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for hash_input in hash_inputs:
+                hash_function(hash_input).hexdigest()
+            best = min(best, time.perf_counter() - started)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = OPTRLedger(str(Path(tmp) / "bench_ledger.jsonl"), hash_algorithm=name)
+            _populate(ledger, events)
+            started = time.perf_counter()
+            verification = ledger.verify_stream(full=True)
+            verify_elapsed = time.perf_counter() - started
+
+        results.append({
+            'hash_algorithm': name,
+            'events': events,
+            'microseconds_per_event': round(best / events * 1e6, 2),
+            'megabytes_per_second': round(total_bytes / best / 1e6, 1),
+            'verify_valid': verification['valid'],
+            'verify_events_per_second': round(events / verify_elapsed, 1)
+        })
+
+    return results
+
+
+def bench_append(
+    sizes: List[int],
+    samples: int = 2000,
+    durability: str = "none"
+) -> List[Dict[str, Any]]:
+    """
+    Measure single-event append_event throughput against ledger size
+
+    Each ledger is pre-filled to the given number of events first, so the
+    results show whether appends stay O(1) as the ledger grows.
+    """
+    results = []
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = OPTRLedger(str(Path(tmp) / "bench_ledger.jsonl"), durability=durability)
+            _populate(ledger, size)
+
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(samples):
+                call_started = time.perf_counter()
+                ledger.append_event(
+                    BENCH_SPEC['event_type'],
+                    BENCH_SPEC['actor'],
+                    BENCH_SPEC['action'],
+                    input_data=BENCH_SPEC['input_data'],
+                    decision=BENCH_SPEC['decision'],
+                    metadata=BENCH_SPEC['metadata']
+                )
+                latencies.append(time.perf_counter() - call_started)
+            elapsed = time.perf_counter() - started
+
+            results.append({
+                'ledger_events': size,
+                'appended': samples,
+                'durability': durability,
+                'events_per_second': round(samples / elapsed, 1),
+                **_percentiles(latencies)
+            })
+
+    return results
+
+
+def bench_verify(
+    events: int = 100000,
+    workers: Optional[List[int]] = None,
+    compressions: Optional[List[Optional[str]]] = None,
+    segment_bytes: int = 4 * 1024 * 1024
+) -> List[Dict[str, Any]]:
+    """
+    Measure full verify_integrity throughput (checkpoints ignored)
+
+    Runs on an unsegmented ledger (compression None), on ledgers sealed
+    into segment_bytes segments with each codec and on a blake2b ledger
+    tampered at the start of every worker range; every parallel run must
+    report the same outcome as the serial one.
+    """
+    results = []
+    outcome = ('valid', 'total_events', 'violation_count')
+
+    for compression in compressions or [None, *SEGMENT_COMPRESSION]:
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger_path = str(Path(tmp) / "bench_ledger.jsonl")
+            options = {}
+            if compression is not None:
+                options = {'segment_max_bytes': segment_bytes, 'segment_compression': compression}
+            _populate(OPTRLedger(ledger_path, **options), events)
+
+            serial = OPTRLedger(ledger_path, **options).verify_integrity(workers=1, full=True)
+            for worker_count in workers or [1]:
+                ledger = OPTRLedger(ledger_path, **options)
+                started = time.perf_counter()
+                verification = ledger.verify_integrity(workers=worker_count, full=True)
+                elapsed = time.perf_counter() - started
+
+                if [verification[key] for key in outcome] != [serial[key] for key in outcome]:
+                    raise RuntimeError(
+                        f"Parallel verification with {worker_count} workers does not match "
+                        f"the serial result (segment compression: {compression})"
+                    )
+
+                results.append({
+                    'events': verification['total_events'],
+                    'segment_compression': compression,
+                    'workers': worker_count,
+                    'valid': verification['valid'],
+                    'seconds': round(elapsed, 4),
+                    'events_per_second': round(verification['total_events'] / elapsed, 1)
+                })
+
+    # Workers starting mid-chain must identify a non-default algorithm even
+    # when the first event of their range was tampered with
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger_path = str(Path(tmp) / "bench_ledger.jsonl")
+        ledger = OPTRLedger(ledger_path, hash_algorithm='blake2b')
+        _populate(ledger, events)
+        ranges = ledger._split_ranges(ledger_path, 0, ledger._ledger_size(), max(workers or [1]) * 4)
+        with open(ledger_path, 'r+b') as f:
+            for start, _ in ranges[1:]:
+                f.seek(start)
+                f.seek(start + f.readline().index(b'"action": "append"') + len(b'"action": "'))
+                f.write(b'A')
+
+        serial = OPTRLedger(ledger_path).verify_integrity(workers=1, full=True)
+        for worker_count in workers or [1]:
+            verification = OPTRLedger(ledger_path).verify_integrity(workers=worker_count, full=True)
+            if [verification[key] for key in outcome] != [serial[key] for key in outcome]:
+                raise RuntimeError(
+                    f"Parallel verification with {worker_count} workers does not match "
+                    f"the serial result on a tampered blake2b ledger"
+                )
+            results.append({
+                'events': verification['total_events'],
+                'hash_algorithm': 'blake2b',
+                'tampered_events': len(ranges) - 1,
+                'workers': worker_count,
+                'violation_count': verification['violation_count']
+            })
+
+    return results
+
+
+def bench_compare(events: int = 100000, fork: float = 0.9) -> List[Dict[str, Any]]:
+    """
+    Measure compare_ledgers against verifying both replicas in full
+
+    The replica is a byte copy of the first fork * events events; both
+    sides then append different events, so they diverge at that index.
+    """
+    results = []
+
+    for record_format in optr_constitutional_ai.LEDGER_FORMATS:
+        with tempfile.TemporaryDirectory() as tmp:
+            primary_path = str(Path(tmp) / "primary.ledger")
+            replica_path = str(Path(tmp) / "replica.ledger")
+            primary = OPTRLedger(primary_path, record_format=record_format)
+            common = int(events * fork)
+            _populate(primary, common)
+            shutil.copy(primary_path, replica_path)
+            if primary.meta_path.exists():
+                shutil.copy(primary.meta_path, replica_path + ".meta.json")
+            replica = OPTRLedger(replica_path)
+            replica.append_event(event_type='benchmark', actor='replica', action='fork')
+            _populate(primary, events - common)
+
+            started = time.perf_counter()
+            comparison = compare_ledgers(primary_path, replica_path)
+            compare_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            primary.verify_integrity(full=True)
+            replica.verify_integrity(full=True)
+            verify_elapsed = time.perf_counter() - started
+
+            results.append({
+                'format': record_format,
+                'events': events,
+                'bytes': os.path.getsize(primary_path),
+                'status': comparison['status'],
+                'divergence_index': comparison['divergence_index'],
+                'method': comparison['method'],
+                'probes': comparison['probes'],
+                'compare_seconds': round(compare_elapsed, 4),
+                'verify_both_seconds': round(verify_elapsed, 4)
+            })
+
+    return results
+
+
+def bench_blob_payloads(
+    events: int = 20000,
+    payload_bytes: int = 8192,
+    blob_threshold: int = 1024
+) -> List[Dict[str, Any]]:
+    """
+    Compare inline prompts with prompts offloaded to the blob store
+
+    Each event carries a distinct payload_bytes prompt; verification of the
+    offloaded ledger hashes only the digests unless deep=True.
+    """
+    results = []
+
+    for mode, threshold in (('inline', None), ('blob', blob_threshold)):
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = OPTRLedger(str(Path(tmp) / "bench_ledger.jsonl"), blob_threshold=threshold)
+            filler = 'x' * payload_bytes
+            started = time.perf_counter()
+            for offset in range(0, events, 1000):
+                ledger.append_events([
+                    dict(BENCH_SPEC, input_data=f"{index:012d}{filler}")
+                    for index in range(offset, min(offset + 1000, events))
+                ])
+            append_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            ledger.verify_integrity(full=True)
+            verify_elapsed = time.perf_counter() - started
+
+            started = time.perf_counter()
+            ledger.tail(1000)
+            tail_elapsed = time.perf_counter() - started
+
+            result = {
+                'mode': mode,
+                'events': events,
+                'payload_bytes': payload_bytes,
+                'ledger_bytes': ledger._ledger_size(),
+                'append_events_per_second': round(events / append_elapsed, 1),
+                'verify_events_per_second': round(events / verify_elapsed, 1),
+                'tail_1000_ms': round(tail_elapsed * 1000, 2)
+            }
+            if threshold is not None:
+                started = time.perf_counter()
+                ledger.verify_integrity(full=True, deep=True)
+                result['deep_verify_events_per_second'] = round(events / (time.perf_counter() - started), 1)
+            results.append(result)
+
+    return results
+
+
+def bench_get_events(
+    sizes: List[int],
+    limits: List[int],
+    repeat: int = 50
+) -> List[Dict[str, Any]]:
+    """Measure get_events(limit) latency against ledger size"""
+    results = []
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = OPTRLedger(str(Path(tmp) / "bench_ledger.jsonl"))
+            _populate(ledger, size)
+
+            for limit in limits:
+                latencies = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    ledger.get_events(limit)
+                    latencies.append(time.perf_counter() - started)
+                results.append({
+                    'ledger_events': size,
+                    'limit': limit,
+                    **_percentiles(latencies)
+                })
+
+    return results
+
+
+class _MockMessagesHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for POST /v1/messages returning a fixed decision"""
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({
+            'id': 'msg_benchmark',
+            'type': 'message',
+            'role': 'assistant',
+            'model': 'mock',
+            'content': [{'type': 'text', 'text': 'COMPLIANT: benchmark decision'}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': 64, 'output_tokens': 8}
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def _time_checks(enforcer: ConstitutionalAIEnforcer, checks: int, decide=None) -> Dict[str, Any]:
+    """
+    Time enforce_constitutional_check and the bare decision call it wraps
+
+    The difference of the medians is the enforcement overhead: prompt
+    construction, hashing and the ledger append. Without decide only the
+    checks are timed.
+    """
+    prompt = "Summarize the attached quarterly report for the board"
+    totals = []
+    decisions = []
+    for _ in range(checks):
+        if decide is not None:
+            started = time.perf_counter()
+            decide(prompt)
+            decisions.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        enforcer.enforce_constitutional_check(prompt, BENCH_RULES)
+        totals.append(time.perf_counter() - started)
+
+    total = _percentiles(totals)
+    if decide is None:
+        return {'checks': checks, 'check': total}
+    decision = _percentiles(decisions)
+    return {
+        'checks': checks,
+        'check': total,
+        'decision': decision,
+        'overhead_p50_us': round(total['p50_us'] - decision['p50_us'], 1)
+    }
+
+
+def bench_enforcer(checks: int = 500) -> List[Dict[str, Any]]:
+    """
+    Measure enforce_constitutional_check latency and overhead
+
+    Runs in simulated mode and, when the anthropic package is installed,
+    against a local mock Messages API server.
+    """
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        enforcer = ConstitutionalAIEnforcer(
+            api_key="", ledger_path=str(Path(tmp) / "simulated.jsonl")
+        )
+        enforcer.client = None
+        results.append({
+            'mode': 'simulated',
+            **_time_checks(
+                enforcer,
+                checks,
+                lambda prompt: enforcer._simulate_constitutional_decision(prompt, BENCH_RULES)
+            ),
+            'ledger_bytes_per_check': round(enforcer.ledger._ledger_size() / checks, 1)
+        })
+
+        if not optr_constitutional_ai.ANTHROPIC_AVAILABLE:
+            results.append({'mode': 'mock_api', 'skipped': "anthropic package not installed"})
+            return results
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _MockMessagesHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        previous_base_url = os.environ.get('ANTHROPIC_BASE_URL')
+        os.environ['ANTHROPIC_BASE_URL'] = f"http://127.0.0.1:{server.server_port}"
+        try:
+            enforcer = ConstitutionalAIEnforcer(
+                api_key="benchmark-key", ledger_path=str(Path(tmp) / "mock_api.jsonl")
+            )
+            prompt_for = lambda prompt: enforcer._build_constitutional_prompt(prompt, BENCH_RULES)
+            uncached = _time_checks(
+                enforcer,
+                checks,
+                lambda prompt: enforcer._get_claude_decision(prompt_for(prompt))
+            )
+            results.append({'mode': 'mock_api', **uncached})
+
+            # The same prompt repeats, so every check after the first is a
+            # cache hit that still appends its ledger event. No API call is
+            # made on a hit, so there is no decision time to subtract; the
+            # result is compared with the uncached run instead
+            enforcer = ConstitutionalAIEnforcer(
+                api_key="benchmark-key",
+                ledger_path=str(Path(tmp) / "mock_api_cached.jsonl"),
+                cache=DecisionCache()
+            )
+            cached = _time_checks(enforcer, checks)
+            results.append({
+                'mode': 'mock_api_cached',
+                **cached,
+                'p50_reduction_us': round(uncached['check']['p50_us'] - cached['check']['p50_us'], 1),
+                'p50_speedup': round(uncached['check']['p50_us'] / cached['check']['p50_us'], 2),
+                'cache': enforcer.cache.stats()
+            })
+        finally:
+            if previous_base_url is None:
+                os.environ.pop('ANTHROPIC_BASE_URL', None)
+            else:
+                os.environ['ANTHROPIC_BASE_URL'] = previous_base_url
+            server.shutdown()
+            server.server_close()
+
+    return results
+
+
+def run_suite(quick: bool = False) -> Dict[str, Any]:
+    """Run every benchmark with default parameters"""
+    scale = 10 if quick else 1
+    return {
+        'append': bench_append([0, 10000 // scale, 100000 // scale], samples=2000 // scale),
+        'verify': bench_verify(100000 // scale, workers=sorted({1, os.cpu_count() or 1})),
+        'read': bench_get_events([10000 // scale, 100000 // scale], [5, 100, 1000]),
+        'enforcer': bench_enforcer(500 // scale),
+        'serialize': bench_serialization(20000 // scale),
+        'hashes': bench_hash_algorithms(20000 // scale),
+        'compare': bench_compare(100000 // scale),
+        'payloads': bench_blob_payloads(20000 // scale),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OPTR ledger benchmarks")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    suite = subparsers.add_parser('suite', help="Run every benchmark")
+    suite.add_argument('--quick', action='store_true', help="Ten times smaller workloads")
+
+    append = subparsers.add_parser('append', help="append_event throughput vs. ledger size")
+    append.add_argument('--sizes', type=int, nargs='+', default=[0, 10000, 100000])
+    append.add_argument('--samples', type=int, default=2000)
+    append.add_argument('--durability', default="none")
+
+    verify = subparsers.add_parser('verify', help="verify_integrity events/sec")
+    verify.add_argument('--events', type=int, default=100000)
+    verify.add_argument('--workers', type=int, nargs='+', default=[1])
+    verify.add_argument(
+        '--compression', nargs='+', choices=sorted(SEGMENT_COMPRESSION),
+        help="Segment codecs to verify (default: unsegmented and every codec)"
+    )
+
+    read = subparsers.add_parser('read', help="get_events(limit) latency")
+    read.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    read.add_argument('--limits', type=int, nargs='+', default=[5, 100, 1000])
+    read.add_argument('--repeat', type=int, default=50)
+
+    enforcer = subparsers.add_parser('enforcer', help="enforce_constitutional_check overhead")
+    enforcer.add_argument('--checks', type=int, default=500)
+
+    concurrency = subparsers.add_parser(
+        'concurrency', help="Multi-process appends to one ledger"
+    )
+    concurrency.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    concurrency.add_argument('--events', type=int, default=2000)
+    concurrency.add_argument('--batch-size', type=int, default=32)
+    concurrency.add_argument('--durability', default="none")
+    concurrency.add_argument('--shards', type=int, default=None)
+
+    serialize = subparsers.add_parser(
+        'serialize', help="Per-event canonical hashing cost"
+    )
+    serialize.add_argument('--events', type=int, default=20000)
+    serialize.add_argument('--repeat', type=int, default=5)
+
+    hashes = subparsers.add_parser(
+        'hashes', help="Chain hash algorithm cost and verification speed"
+    )
+    hashes.add_argument('--events', type=int, default=20000)
+    hashes.add_argument('--repeat', type=int, default=5)
+
+    compare = subparsers.add_parser(
+        'compare', help="Replica divergence search vs. full verification"
+    )
+    compare.add_argument('--events', type=int, default=100000)
+    compare.add_argument('--fork', type=float, default=0.9)
+
+    payloads = subparsers.add_parser(
+        'payloads', help="Inline vs. blob-store prompt payloads"
+    )
+    payloads.add_argument('--events', type=int, default=20000)
+    payloads.add_argument('--payload-bytes', type=int, default=8192)
+    payloads.add_argument('--blob-threshold', type=int, default=1024)
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        results = run_suite(args.quick)
+    elif args.benchmark == 'append':
+        results = bench_append(args.sizes, args.samples, args.durability)
+    elif args.benchmark == 'verify':
+        results = bench_verify(args.events, args.workers, args.compression)
+    elif args.benchmark == 'read':
+        results = bench_get_events(args.sizes, args.limits, args.repeat)
+    elif args.benchmark == 'enforcer':
+        results = bench_enforcer(args.checks)
+    elif args.benchmark == 'concurrency':
+        results = bench_concurrent_appends(
+            args.workers, args.events, args.batch_size, args.durability, args.shards
+        )
+    elif args.benchmark == 'serialize':
+        results = bench_serialization(args.events, args.repeat)
+    elif args.benchmark == 'hashes':
+        results = bench_hash_algorithms(args.events, args.repeat)
+    elif args.benchmark == 'compare':
+        results = bench_compare(args.events, args.fork)
+    elif args.benchmark == 'payloads':
+        results = bench_blob_payloads(args.events, args.payload_bytes, args.blob_threshold)
+
+    report = {'benchmark': args.benchmark, 'environment': _environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,32 @@ Research Focus: Scalable Oversight, Adversarial Robustness, Constitutional AI
 Created for: Anthropic AI Safety Fellow Application
 """
 
+import asyncio
+import bz2
+import copy
+import functools
+import gzip
 import hashlib
+import heapq
+import io
+import itertools
 import json
+import lzma
+import mmap
 import os
-from datetime import datetime
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, List, Tuple, Iterator, Callable
+from dataclasses import dataclass
 
 try:
     import anthropic
@@ -23,60 +42,3832 @@ except ImportError:
     ANTHROPIC_AVAILABLE = False
     anthropic = None
 
+try:
+    from compression import zstd  # Python 3.14+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    zstd = None
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = None
+    pq = None
+
+
+GENESIS_HASH = "0" * 64
+
+# Claude model asked for constitutional decisions
+DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
+
+# Chain hash algorithms, all with 32-byte digests so binary records and
+# Merkle leaves are unchanged; the genesis algorithm is kept in .meta.json
+HASH_ALGORITHMS = {
+    'sha256': hashlib.sha256,
+    'sha3_256': hashlib.sha3_256,
+    'blake2b': functools.partial(hashlib.blake2b, digest_size=32),
+    'blake2s': hashlib.blake2s,
+}
+DEFAULT_HASH_ALGORITHM = 'sha256'
+
+# In-band anchor event that switches the chain to another hash algorithm
+HASH_MIGRATION_EVENT = "hash_algorithm_migration"
+
+# Root-chain event committing the head of every shard of a ShardedOPTRLedger
+SHARD_ANCHOR_EVENT = "shard_anchor"
+
+# input/decision values above a ledger's blob_threshold are replaced by a
+# reference into its content-addressed blob store, "blob:sha256:<hex>:<chars>"
+# with the payload's length in characters, and the replaced fields are listed
+# in metadata[BLOB_OFFLOADED_KEY]; the chain hashes both. Values of fields
+# not listed there are inline, whatever they look like
+BLOB_REF_PREFIX = "blob:sha256:"
+BLOB_OFFLOADED_KEY = "offloaded"
+BLOB_FIELDS = {'input_data': 'input', 'decision': 'decision'}    # spec key -> event field
+
+# Event registering a constitutional rule set once under its content hash;
+# decision events reference it through metadata['constitutional_rules_ref']
+RULE_SET_EVENT = "constitutional_rule_set"
+
+# Bookkeeping events the ledger writes itself; they carry no compliance
+# decision, so queries, columns and stats never count them as non-compliant
+NON_DECISION_EVENTS = (RULE_SET_EVENT, HASH_MIGRATION_EVENT, SHARD_ANCHOR_EVENT)
+
+# Block size used when scanning the ledger backwards from EOF
+TAIL_READ_BLOCK = 64 * 1024
+
+# Durability modes for ledger appends
+DURABILITY_NONE = "none"      # Leave flushing to the OS page cache
+DURABILITY_BATCH = "batch"    # One fsync per appended batch (group commit)
+DURABILITY_EVENT = "event"    # One fsync per appended event
+DURABILITY_MODES = (DURABILITY_NONE, DURABILITY_BATCH, DURABILITY_EVENT)
+
+# Smallest byte range handed to a verification worker
+VERIFY_MIN_CHUNK = 1024 * 1024
+
+# Verification checkpoints kept in the .checkpoints sidecar; older ones only
+# matter when the ledger was rewritten behind all of the newer ones
+CHECKPOINT_HISTORY = 8
+
+# Appends between writes of the .stats sidecar; counters that were not yet
+# written are refolded from the ledger by the next process to read them
+STATS_SAVE_EVERY = 64
+
+# Most recent hours kept in the per-hour compliance buckets
+STATS_HOURLY_BUCKETS = 24 * 31
+
+# Columns of OPTRColumns.data: (name, NumPy dtype)
+COLUMN_DTYPE = [
+    ('timestamp', 'i8'),       # Microseconds since the epoch, UTC
+    ('actor', 'i4'),           # Code into OPTRColumns.actors
+    ('event_type', 'i4'),      # Code into OPTRColumns.event_types
+    ('is_decision', '?'),      # False for NON_DECISION_EVENTS
+    ('is_compliant', '?'),     # Always False when not is_decision
+    ('input_length', 'i8'),    # Characters of the event input, offloaded or not (0 when absent)
+]
+
+# Codecs for sealed ledger segments: name -> (file suffix, opener)
+SEGMENT_COMPRESSION = {
+    'none': ('', open),
+    'gzip': ('.gz', gzip.open),
+    'bz2': ('.bz2', bz2.open),
+    'lzma': ('.xz', lzma.open),
+}
+if ZSTD_AVAILABLE:
+    SEGMENT_COMPRESSION['zstd'] = ('.zst', zstd.open)
+
+
+_encode_json_string = json.encoder.encode_basestring_ascii
+
+
+def _json_value(value: Any) -> str:
+    """JSON-encode one field exactly as json.dumps(..., sort_keys=True) does"""
+    if value is None:
+        return 'null'
+    if type(value) is str:
+        return _encode_json_string(value)
+    return json.dumps(value, sort_keys=True)
+
+
+class InvalidEventError(ValueError):
+    """An appended event specification was rejected before anything was written"""
+
+
+@dataclass(slots=True)
+class OPTREvent:
+    """Single event in the OPTR ledger with cryptographic hash chain"""
+    timestamp: str
+    event_id: str
+    event_type: str
+    actor: str
+    action: str
+    input: Optional[str] = None
+    decision: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    previous_hash: str = ""
+    current_hash: str = ""
+    
+    def canonical_json(self) -> str:
+        """
+        Canonical JSON of the event without current_hash (the hash input)
+        
+        Byte-identical to json.dumps(asdict(event) - current_hash,
+        sort_keys=True), but written field by field in sorted key order
+        instead of deep-copying the event and sorting its keys.
+        """
+        return (
+            '{"action": ' + _json_value(self.action)
+            + ', "actor": ' + _json_value(self.actor)
+            + ', "decision": ' + _json_value(self.decision)
+            + ', "event_id": ' + _json_value(self.event_id)
+            + ', "event_type": ' + _json_value(self.event_type)
+            + ', "input": ' + _json_value(self.input)
+            + ', "metadata": ' + _json_value(self.metadata)
+            + ', "previous_hash": ' + _json_value(self.previous_hash)
+            + ', "timestamp": ' + _json_value(self.timestamp) + '}'
+        )
+
+
+def _calculate_event_hash(event: OPTREvent, algorithm: str = DEFAULT_HASH_ALGORITHM) -> str:
+    """Calculate the chain hash for an event (previous hash + canonical JSON)"""
+    hash_input = event.previous_hash + event.canonical_json()
+    return HASH_ALGORITHMS[algorithm](hash_input.encode()).hexdigest()
+
+
+def _next_hash_algorithm(event: OPTREvent, algorithm: str) -> str:
+    """Hash algorithm of the event following `event`; anchors switch it"""
+    if event.event_type == HASH_MIGRATION_EVENT:
+        target = (event.metadata or {}).get('hash_algorithm')
+        if target in HASH_ALGORITHMS:
+            return target
+    return algorithm
+
+
+def _match_hash_algorithm(event: OPTREvent, preferred: str = DEFAULT_HASH_ALGORITHM) -> Optional[str]:
+    """Identify the algorithm an event was hashed with (preferred first)"""
+    hash_input = (event.previous_hash + event.canonical_json()).encode()
+    for algorithm in [preferred] + [name for name in HASH_ALGORITHMS if name != preferred]:
+        if HASH_ALGORITHMS[algorithm](hash_input).hexdigest() == event.current_hash:
+            return algorithm
+    return None
+
+
+def _rule_set_hash(rules: List[str]) -> str:
+    """Content hash identifying a constitutional rule set"""
+    return hashlib.sha256(json.dumps(rules).encode()).hexdigest()
+
+
+def _blob_path(blob_dir: Path, digest: str) -> Path:
+    """Location of a payload in a blob store (fanned out by digest prefix)"""
+    return blob_dir / digest[:2] / digest
+
+
+def _parse_blob_ref(metadata: Any, field: str, value: Any) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    (digest, payload length) of an offloaded event field, or None if inline
+    
+    Only fields listed in metadata[BLOB_OFFLOADED_KEY] are references; a
+    listed field that does not hold one yields an empty digest, which no
+    blob matches.
+    """
+    offloaded = metadata.get(BLOB_OFFLOADED_KEY) if isinstance(metadata, dict) else None
+    if not isinstance(offloaded, list) or field not in offloaded:
+        return None
+    if not isinstance(value, str) or not value.startswith(BLOB_REF_PREFIX):
+        return '', None
+    digest, _, length = value[len(BLOB_REF_PREFIX):].partition(':')
+    return digest, int(length) if length.isdigit() else None
+
+
+def _payload_length(event_dict: Dict[str, Any], field: str) -> int:
+    """Characters of an input/decision value, offloaded or inline (0 when absent)"""
+    value = event_dict.get(field)
+    if value is None:
+        return 0
+    reference = _parse_blob_ref(event_dict.get('metadata'), field, value)
+    if reference is not None and reference[1] is not None:
+        return reference[1]
+    return len(value if isinstance(value, str) else _json_value(value))
+
+
+def _blob_intact(blob_dir: Path, metadata: Any, field: str, value: Any) -> bool:
+    """Whether an event field is inline, or offloaded to a payload that matches its reference"""
+    reference = _parse_blob_ref(metadata, field, value)
+    if reference is None:
+        return True
+    digest, length = reference
+    if not digest:
+        return False
+    try:
+        with open(_blob_path(blob_dir, digest), 'rb') as f:
+            payload = f.read()
+        return hashlib.sha256(payload).hexdigest() == digest and (
+            length is None or len(payload.decode()) == length
+        )
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def _ledger_line(canonical_json: str, current_hash: str) -> bytes:
+    """JSONL ledger line: the canonical hash input with current_hash appended"""
+    return (canonical_json[:-1] + ', "current_hash": "' + current_hash + '"}\n').encode()
+
+
+def _timestamp_micros(timestamp: Any) -> int:
+    """Microseconds since the epoch for an ISO-8601 UTC timestamp or datetime"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.rstrip('Z'))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    delta = timestamp - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _format_timestamp(micros: int) -> str:
+    """ISO-8601 UTC timestamp as generated for ledger events"""
+    return (datetime(1970, 1, 1) + timedelta(microseconds=micros)).isoformat() + 'Z'
+
+
+class JSONLRecordFormat:
+    """
+    One JSON object per line, the original OPTR ledger format
+    
+    Record iterators work on any seekable binary file object (ledger files,
+    decompressed segments) and yield (byte offset, event dict) pairs.
+    """
+    
+    name = 'jsonl'
+    extension = 'jsonl'
+    resyncs = True    # A record that fails to decode ends at its newline
+    
+    @staticmethod
+    def encode(event: OPTREvent) -> bytes:
+        return _ledger_line(event.canonical_json(), event.current_hash)
+    
+    @staticmethod
+    def decode(record: bytes) -> Dict[str, Any]:
+        return json.loads(record)
+    
+    @staticmethod
+    def iter_records(f, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            if line.strip():
+                yield position, json.loads(line)
+            position += len(line)
+    
+    @staticmethod
+    def iter_raw_records(f, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        """Undecoded records, so one that fails to decode does not end the walk"""
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            if line.strip():
+                yield position, line
+            position += len(line)
+    
+    @staticmethod
+    def count_records(f, start: int = 0, end: Optional[int] = None) -> int:
+        f.seek(start)
+        if end is None:
+            return sum(1 for line in f if line.strip())
+        count = 0
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            if line.strip():
+                count += 1
+            position += len(line)
+        return count
+    
+    @staticmethod
+    def reverse_records(f, end: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Walk records backwards from `end` in fixed TAIL_READ_BLOCK blocks"""
+        position = end
+        # Bytes after the last newline seen so far (a line still being assembled)
+        partial = b''
+        
+        while position > 0:
+            step = min(TAIL_READ_BLOCK, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + partial
+            
+            lines = block.split(b'\n')
+            partial = lines[0]
+            line_end = position + len(block)
+            for line in reversed(lines[1:]):
+                line_end -= len(line) + 1
+                if line.strip():
+                    yield line_end + 1, json.loads(line)
+        
+        if partial.strip():
+            yield 0, json.loads(partial)
+    
+    @staticmethod
+    def record_at(f, offset: int) -> Dict[str, Any]:
+        f.seek(offset)
+        return json.loads(f.readline())
+    
+    @staticmethod
+    def next_boundary(f, position: int, start: int) -> int:
+        """First record boundary at or after `position`"""
+        f.seek(position - 1)
+        f.readline()
+        return f.tell()
+    
+    @staticmethod
+    def complete_end(f, start: int, end: int) -> int:
+        """End of the last newline-terminated record in [start, end)"""
+        position = end
+        while position > start:
+            step = min(TAIL_READ_BLOCK, position - start)
+            position -= step
+            f.seek(position)
+            newline = f.read(step).rfind(b'\n')
+            if newline != -1:
+                return position + newline + 1
+        return start
+
+
+class BinaryRecordFormat:
+    """
+    Compact length-prefixed binary records
+    
+    Layout: u32 length | previous_hash (32 raw bytes) | current_hash (32 raw
+    bytes) | i64 timestamp in microseconds | u8 flags | payload | u32 length.
+    The payload is a compact JSON array of the remaining fields, so field
+    names are not repeated per event. The trailing length allows walking
+    records backwards from EOF.
+    
+    Hashes are still computed over the canonical JSON encoding of the
+    decoded event, so both formats produce the same, verifiable chain.
+    Headers are read straight out of an mmap/memoryview of the file.
+    """
+    
+    name = 'binary'
+    extension = 'bin'
+    resyncs = False    # Framing after an undecodable record cannot be trusted
+    LENGTH = struct.Struct('<I')
+    HEADER = struct.Struct('<32s32sqB')
+    FLAG_TEXT_TIMESTAMP = 1    # timestamp kept verbatim as the last payload item
+    PAYLOAD_FIELDS = ('event_id', 'event_type', 'actor', 'action', 'input', 'decision', 'metadata')
+    
+    @classmethod
+    def encode(cls, event: OPTREvent) -> bytes:
+        payload = [getattr(event, field) for field in cls.PAYLOAD_FIELDS]
+        flags = 0
+        try:
+            micros = _timestamp_micros(event.timestamp)
+            if _format_timestamp(micros) != event.timestamp:
+                raise ValueError(event.timestamp)
+        except ValueError:
+            # Not in the generated form; keep the original text
+            micros = 0
+            flags |= cls.FLAG_TEXT_TIMESTAMP
+            payload.append(event.timestamp)
+        
+        body = cls.HEADER.pack(
+            bytes.fromhex(event.previous_hash),
+            bytes.fromhex(event.current_hash),
+            micros,
+            flags
+        ) + json.dumps(payload, separators=(',', ':')).encode()
+        length = cls.LENGTH.pack(len(body))
+        return length + body + length
+    
+    @classmethod
+    def _decode_at(cls, buffer, offset: int) -> Tuple[Dict[str, Any], int]:
+        """Decode the record at `offset`; returns the event dict and the record end"""
+        (length,) = cls.LENGTH.unpack_from(buffer, offset)
+        body = offset + cls.LENGTH.size
+        previous_hash, current_hash, micros, flags = cls.HEADER.unpack_from(buffer, body)
+        payload = json.loads(bytes(buffer[body + cls.HEADER.size:body + length]))
+        
+        event_dict = dict(zip(cls.PAYLOAD_FIELDS, payload))
+        event_dict['timestamp'] = (
+            payload[-1] if flags & cls.FLAG_TEXT_TIMESTAMP else _format_timestamp(micros)
+        )
+        event_dict['previous_hash'] = previous_hash.hex()
+        event_dict['current_hash'] = current_hash.hex()
+        return event_dict, body + length + cls.LENGTH.size
+    
+    @classmethod
+    def decode(cls, record: bytes) -> Dict[str, Any]:
+        return cls._decode_at(record, 0)[0]
+    
+    @staticmethod
+    @contextmanager
+    def _buffer(f):
+        """
+        Zero-copy view of a file: an mmap of ledger files, the buffer of
+        in-memory data, and the decompressed bytes of compressed streams
+        """
+        if isinstance(f, io.BytesIO):
+            view = f.getbuffer()
+            try:
+                yield view
+            finally:
+                view.release()
+        elif isinstance(f, io.BufferedReader):
+            if not os.fstat(f.fileno()).st_size:
+                yield b''
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    yield mm
+        else:
+            f.seek(0)
+            yield f.read()
+    
+    @classmethod
+    def iter_records(cls, f, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        with cls._buffer(f) as buffer:
+            end = len(buffer) if end is None else min(end, len(buffer))
+            position = start
+            while position + cls.LENGTH.size <= end:
+                (length,) = cls.LENGTH.unpack_from(buffer, position)
+                if position + length + 2 * cls.LENGTH.size > len(buffer):
+                    break  # Incomplete trailing record
+                event_dict, record_end = cls._decode_at(buffer, position)
+                yield position, event_dict
+                position = record_end
+    
+    @classmethod
+    def iter_raw_records(cls, f, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        """Undecoded records as framed by their length prefixes"""
+        with cls._buffer(f) as buffer:
+            end = len(buffer) if end is None else min(end, len(buffer))
+            position = start
+            while position + cls.LENGTH.size <= end:
+                (length,) = cls.LENGTH.unpack_from(buffer, position)
+                record_end = position + length + 2 * cls.LENGTH.size
+                if record_end > len(buffer):
+                    break  # Incomplete trailing record
+                yield position, bytes(buffer[position:record_end])
+                position = record_end
+    
+    @classmethod
+    def count_records(cls, f, start: int = 0, end: Optional[int] = None) -> int:
+        with cls._buffer(f) as buffer:
+            end = len(buffer) if end is None else min(end, len(buffer))
+            count = 0
+            position = start
+            while position + cls.LENGTH.size <= end:
+                (length,) = cls.LENGTH.unpack_from(buffer, position)
+                position += length + 2 * cls.LENGTH.size
+                if position > len(buffer):
+                    break
+                count += 1
+            return count
+    
+    @classmethod
+    def reverse_records(cls, f, end: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        with cls._buffer(f) as buffer:
+            position = min(end, len(buffer))
+            while position >= 2 * cls.LENGTH.size:
+                (length,) = cls.LENGTH.unpack_from(buffer, position - cls.LENGTH.size)
+                start = position - length - 2 * cls.LENGTH.size
+                if start < 0:
+                    break
+                yield start, cls._decode_at(buffer, start)[0]
+                position = start
+    
+    @classmethod
+    def record_at(cls, f, offset: int) -> Dict[str, Any]:
+        f.seek(offset)
+        prefix = f.read(cls.LENGTH.size)
+        (length,) = cls.LENGTH.unpack(prefix)
+        return cls.decode(prefix + f.read(length))
+    
+    @classmethod
+    def next_boundary(cls, f, position: int, start: int) -> int:
+        """First record boundary at or after `position`, walking lengths from `start`"""
+        with cls._buffer(f) as buffer:
+            boundary = start
+            while boundary < position:
+                if boundary + cls.LENGTH.size > len(buffer):
+                    return len(buffer)
+                (length,) = cls.LENGTH.unpack_from(buffer, boundary)
+                boundary += length + 2 * cls.LENGTH.size
+            return boundary
+    
+    @classmethod
+    def complete_end(cls, f, start: int, end: int) -> int:
+        """End of the last fully framed record, walking lengths from `start`"""
+        position = start
+        f.seek(position)
+        while position + 2 * cls.LENGTH.size + cls.HEADER.size <= end:
+            (length,) = cls.LENGTH.unpack(f.read(cls.LENGTH.size))
+            record_end = position + length + 2 * cls.LENGTH.size
+            if length < cls.HEADER.size or record_end > end:
+                break
+            f.seek(record_end - cls.LENGTH.size)
+            if cls.LENGTH.unpack(f.read(cls.LENGTH.size))[0] != length:
+                break
+            position = record_end
+        return position
+
+
+LEDGER_FORMATS = {
+    JSONLRecordFormat.name: JSONLRecordFormat,
+    BinaryRecordFormat.name: BinaryRecordFormat,
+}
+
+
+def _open_segment(path: str, compression: str = 'none'):
+    """Open a ledger file or sealed segment for binary reading"""
+    return SEGMENT_COMPRESSION[compression][1](path, 'rb')
+
+
+def _verify_chunk(
+    ledger_path: str,
+    start: int,
+    end: int,
+    compression: str = 'none',
+    record_format: str = 'jsonl',
+    max_violations: Optional[int] = None,
+    hash_algorithm: Optional[str] = None,
+    blob_dir: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Recompute the hashes of the ledger records in the byte range [start, end)
+    
+    Offsets are relative to the (decompressed) file at ledger_path, which
+    is either the active ledger file or a sealed segment.
+    
+    Runs in verification worker processes. Linkage is checked inside the
+    chunk only; the first event's previous_hash is returned so the caller
+    can stitch it to the preceding chunk. Chunks that start mid-chain
+    (hash_algorithm None) identify their algorithm from the first event that
+    verifies under one and report it for the caller to check; events before
+    it verify under no algorithm and are hash violations either way. With
+    blob_dir, referenced payloads are also read and checked against their
+    digests.
+    
+    Returns:
+        dict: Event count, first previous_hash, last current_hash, the
+            hash algorithm of the first event (None if it matches none) and
+            of the event after the chunk, the
+            number of violations and up to max_violations (local index,
+            kind) pairs with kind 'link', 'hash' or 'blob'
+    """
+    count = 0
+    first_previous_hash = None
+    expected_previous_hash = None
+    first_algorithm = algorithm = hash_algorithm
+    violations = []
+    violation_count = 0
+    
+    with _open_segment(ledger_path, compression) as f:
+        for _, event_dict in LEDGER_FORMATS[record_format].iter_records(f, start, end):
+            found = []
+            if first_previous_hash is None:
+                first_previous_hash = event_dict['previous_hash']
+            elif event_dict['previous_hash'] != expected_previous_hash:
+                found.append((count, 'link'))
+            
+            event = OPTREvent(**event_dict)
+            if algorithm is None:
+                algorithm = _match_hash_algorithm(event)
+                if not count:
+                    first_algorithm = algorithm
+            if algorithm is None or _calculate_event_hash(event, algorithm) != event.current_hash:
+                found.append((count, 'hash'))
+            if blob_dir is not None and not (
+                _blob_intact(Path(blob_dir), event.metadata, 'input', event.input)
+                and _blob_intact(Path(blob_dir), event.metadata, 'decision', event.decision)
+            ):
+                found.append((count, 'blob'))
+            
+            violation_count += len(found)
+            if max_violations is None or len(violations) < max_violations:
+                violations.extend(found)
+            
+            expected_previous_hash = event.current_hash
+            algorithm = _next_hash_algorithm(event, algorithm)
+            count += 1
+    
+    return {
+        'count': count,
+        'first_previous_hash': first_previous_hash,
+        'last_hash': expected_previous_hash,
+        'first_hash_algorithm': first_algorithm,
+        'next_hash_algorithm': algorithm,
+        'violation_count': violation_count,
+        'violations': violations
+    }
+
+
+def _merkle_leaf(event_hash: str) -> bytes:
+    """RFC 6962 leaf hash of an event's current_hash"""
+    return hashlib.sha256(b'\x00' + bytes.fromhex(event_hash)).digest()
+
+
+def _merkle_node(left: bytes, right: bytes) -> bytes:
+    """RFC 6962 interior node hash"""
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def _largest_power_of_two_below(n: int) -> int:
+    """Largest power of two strictly smaller than n (n > 1)"""
+    return 1 << ((n - 1).bit_length() - 1)
+
+
+def verify_inclusion_proof(
+    event_hash: str,
+    index: int,
+    tree_size: int,
+    proof: List[str],
+    root: str
+) -> bool:
+    """
+    Verify that an event is included in a ledger Merkle tree (RFC 9162)
+    
+    Runs offline: auditors only need the event's current_hash, its index,
+    the proof and a trusted root for the given tree size.
+    """
+    if index >= tree_size:
+        return False
+    
+    fn, sn = index, tree_size - 1
+    result = _merkle_leaf(event_hash)
+    for sibling in proof:
+        if sn == 0:
+            return False
+        sibling = bytes.fromhex(sibling)
+        if fn & 1 or fn == sn:
+            result = _merkle_node(sibling, result)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            result = _merkle_node(result, sibling)
+        fn >>= 1
+        sn >>= 1
+    
+    return sn == 0 and result.hex() == root
+
+
+def verify_consistency_proof(
+    old_size: int,
+    new_size: int,
+    old_root: str,
+    new_root: str,
+    proof: List[str]
+) -> bool:
+    """
+    Verify that a ledger of old_size events is a prefix of one of new_size (RFC 9162)
+    
+    Proves append-only growth between two published roots without access
+    to the events themselves.
+    """
+    if old_size > new_size:
+        return False
+    if old_size == new_size:
+        return not proof and old_root == new_root
+    if old_size == 0:
+        return not proof
+    
+    path = [bytes.fromhex(node) for node in proof]
+    if old_size & (old_size - 1) == 0:
+        path = [bytes.fromhex(old_root)] + path
+    if not path:
+        return False
+    
+    fn, sn = old_size - 1, new_size - 1
+    while fn & 1:
+        fn >>= 1
+        sn >>= 1
+    
+    old_result = new_result = path[0]
+    for node in path[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            old_result = _merkle_node(node, old_result)
+            new_result = _merkle_node(node, new_result)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            new_result = _merkle_node(new_result, node)
+        fn >>= 1
+        sn >>= 1
+    
+    return sn == 0 and old_result.hex() == old_root and new_result.hex() == new_root
+
+
+class OPTRMerkleTree:
+    """
+    Incrementally built Merkle tree over the ledger's event hashes
+    
+    Every complete, aligned subtree is stored once, one fixed-width file per
+    tree level, so appends are amortized O(1) and roots, inclusion proofs
+    and consistency proofs touch O(log n) stored nodes.
+    """
+    
+    NODE_SIZE = 32
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def _level_path(self, level: int) -> Path:
+        return self.directory / f"level_{level:02d}.bin"
+    
+    def _level_count(self, level: int) -> int:
+        try:
+            return self._level_path(level).stat().st_size // self.NODE_SIZE
+        except FileNotFoundError:
+            return 0
+    
+    @property
+    def size(self) -> int:
+        """Number of leaves (events) in the tree"""
+        return self._level_count(0)
+    
+    def reset(self) -> None:
+        """Drop all stored levels so the tree can be rebuilt"""
+        for path in self.directory.glob("level_*.bin"):
+            path.unlink()
+    
+    def repair(self, batch: int = 4096) -> bool:
+        """
+        Bring the upper levels back in step with the leaves
+        
+        Levels are appended one file at a time, so a crash mid-append can
+        leave them short or torn. Level L must hold size >> L nodes: surplus
+        and partial nodes are cut, and missing ones are recomputed from the
+        level below.
+        
+        Returns:
+            bool: True if any level file was changed
+        """
+        changed = False
+        leaves = self.size
+        for path in self.directory.glob("level_*.bin"):
+            nodes = leaves >> int(path.stem[len("level_"):])
+            if path.stat().st_size > nodes * self.NODE_SIZE:
+                if nodes:
+                    os.truncate(path, nodes * self.NODE_SIZE)
+                else:
+                    path.unlink()
+                changed = True
+        
+        level = 1
+        while leaves >> level:
+            count = self._level_count(level)
+            expected = leaves >> level
+            if count < expected:
+                with open(self._level_path(level - 1), 'rb') as below, open(self._level_path(level), 'ab') as f:
+                    below.seek(count * 2 * self.NODE_SIZE)
+                    while count < expected:
+                        pairs = below.read(min(batch, expected - count) * 2 * self.NODE_SIZE)
+                        f.write(b''.join(
+                            _merkle_node(pairs[i:i + self.NODE_SIZE], pairs[i + self.NODE_SIZE:i + 2 * self.NODE_SIZE])
+                            for i in range(0, len(pairs), 2 * self.NODE_SIZE)
+                        ))
+                        count += len(pairs) // (2 * self.NODE_SIZE)
+                changed = True
+            level += 1
+        return changed
+    
+    def append(self, event_hashes: List[str]) -> None:
+        """Append leaves for new events and complete any finished subtrees"""
+        nodes = [_merkle_leaf(event_hash) for event_hash in event_hashes]
+        level = 0
+        
+        while nodes:
+            path = self._level_path(level)
+            count = self._level_count(level)
+            
+            # An unpaired node at this level pairs with the first new one
+            pending = nodes
+            if count % 2 == 1:
+                with open(path, 'rb') as f:
+                    f.seek((count - 1) * self.NODE_SIZE)
+                    pending = [f.read(self.NODE_SIZE)] + nodes
+            
+            with open(path, 'ab') as f:
+                f.write(b''.join(nodes))
+            
+            nodes = [
+                _merkle_node(pending[i], pending[i + 1])
+                for i in range(0, len(pending) - 1, 2)
+            ]
+            level += 1
+    
+    @contextmanager
+    def _reader(self):
+        """Yield a stored-node reader that keeps level files open"""
+        files = {}
+        
+        def read_node(level: int, index: int) -> bytes:
+            if level not in files:
+                files[level] = open(self._level_path(level), 'rb')
+            files[level].seek(index * self.NODE_SIZE)
+            return files[level].read(self.NODE_SIZE)
+        
+        try:
+            yield read_node
+        finally:
+            for f in files.values():
+                f.close()
+    
+    def _subtree(self, read_node, start: int, end: int) -> bytes:
+        """Merkle tree hash of leaves [start, end)"""
+        width = end - start
+        if width & (width - 1) == 0:
+            # Complete aligned subtree: stored at level log2(width)
+            return read_node(width.bit_length() - 1, start // width)
+        
+        split = _largest_power_of_two_below(width)
+        return _merkle_node(
+            self._subtree(read_node, start, start + split),
+            self._subtree(read_node, start + split, end)
+        )
+    
+    def _check_size(self, tree_size: int) -> None:
+        if not 0 <= tree_size <= self.size:
+            raise ValueError(f"Tree size {tree_size} outside 0..{self.size}")
+    
+    def root(self, tree_size: Optional[int] = None) -> str:
+        """Root hash of the first tree_size leaves (defaults to all)"""
+        tree_size = self.size if tree_size is None else tree_size
+        self._check_size(tree_size)
+        if tree_size == 0:
+            return hashlib.sha256(b'').hexdigest()
+        
+        with self._reader() as read_node:
+            return self._subtree(read_node, 0, tree_size).hex()
+    
+    def inclusion_proof(self, index: int, tree_size: int) -> List[str]:
+        """Audit path for leaf `index` in the tree of tree_size leaves"""
+        self._check_size(tree_size)
+        if not 0 <= index < tree_size:
+            raise ValueError(f"Leaf {index} outside tree of size {tree_size}")
+        
+        proof = []
+        with self._reader() as read_node:
+            start, end = 0, tree_size
+            while end - start > 1:
+                split = _largest_power_of_two_below(end - start)
+                if index < start + split:
+                    proof.append(self._subtree(read_node, start + split, end))
+                    end = start + split
+                else:
+                    proof.append(self._subtree(read_node, start, start + split))
+                    start += split
+        
+        return [node.hex() for node in reversed(proof)]
+    
+    def consistency_proof(self, old_size: int, new_size: int) -> List[str]:
+        """Proof that the tree of old_size leaves is a prefix of new_size"""
+        self._check_size(new_size)
+        if not 0 <= old_size <= new_size:
+            raise ValueError(f"Old size {old_size} outside 0..{new_size}")
+        if old_size in (0, new_size):
+            return []
+        
+        proof = []
+        with self._reader() as read_node:
+            start, end, complete = 0, new_size, True
+            while True:
+                if old_size == end - start:
+                    if not complete:
+                        proof.append(self._subtree(read_node, start, end))
+                    break
+                
+                split = _largest_power_of_two_below(end - start)
+                if old_size <= split:
+                    proof.append(self._subtree(read_node, start + split, end))
+                    end = start + split
+                else:
+                    proof.append(self._subtree(read_node, start, start + split))
+                    old_size -= split
+                    start += split
+                    complete = False
+        
+        return [node.hex() for node in reversed(proof)]
+
+
+def _event_id_key(event_id: str) -> Optional[int]:
+    """Numeric sort key of an evt_<epoch ms> event ID, or None if it has another form"""
+    if not event_id.startswith("evt_"):
+        return None
+    try:
+        return int(event_id[len("evt_"):])
+    except ValueError:
+        return None
+
+
+class OPTREventIndex:
+    """
+    Persistent event_id -> byte offset index for point lookups
+    
+    One fixed-width (event ID key, byte offset) record per event, in chain
+    order, so record i also maps event index i to its offset. Event IDs are
+    generated in non-decreasing order, which keeps the records sorted by key
+    and lets lookups binary-search a memory map of the file. Ledgers with
+    out-of-order or foreign IDs are flagged unsorted and scanned instead.
+    """
+    
+    MAGIC = b'OPTRIDX1'
+    HEADER = struct.Struct('<8sQ')   # magic, flags
+    RECORD = struct.Struct('<qQ')    # event ID key, byte offset
+    FLAG_UNSORTED = 1
+    
+    def __init__(self, path: Path):
+        self.path = path
+    
+    @property
+    def size(self) -> int:
+        """Number of indexed events"""
+        try:
+            file_size = self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        return max(file_size - self.HEADER.size, 0) // self.RECORD.size
+    
+    def reset(self) -> None:
+        """Drop the index so it can be rebuilt from the ledger"""
+        with open(self.path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, 0))
+    
+    def _read_flags(self, f) -> int:
+        f.seek(0)
+        magic, flags = self.HEADER.unpack(f.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            raise ValueError(f"{self.path} is not an OPTR event index")
+        return flags
+    
+    def append(self, entries: List[Tuple[str, int]]) -> None:
+        """Index (event_id, byte offset) pairs for newly appended events"""
+        if not entries:
+            return
+        if not self.path.exists():
+            self.reset()
+        
+        with open(self.path, 'r+b') as f:
+            flags = self._read_flags(f)
+            count = self.size
+            last_key = None
+            if count:
+                f.seek(self.HEADER.size + (count - 1) * self.RECORD.size)
+                last_key = self.RECORD.unpack(f.read(self.RECORD.size))[0]
+            
+            records = []
+            for event_id, offset in entries:
+                key = _event_id_key(event_id)
+                if key is None or (last_key is not None and key < last_key):
+                    flags |= self.FLAG_UNSORTED
+                    key = -1 if key is None else key
+                records.append(self.RECORD.pack(key, offset))
+                last_key = key
+            
+            f.seek(self.HEADER.size + count * self.RECORD.size)
+            f.write(b''.join(records))
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, flags))
+    
+    def offset_at(self, index: int) -> int:
+        """Byte offset of the event at a given chain index"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.HEADER.size + index * self.RECORD.size)
+            return self.RECORD.unpack(f.read(self.RECORD.size))[1]
+    
+    def lookup(self, event_id: str) -> List[Tuple[int, int]]:
+        """
+        Candidate (event index, byte offset) pairs for an event ID
+        
+        Candidates share the ID's numeric key; callers confirm the match
+        against the ledger line. IDs with another form are never indexed
+        by key and return every unkeyed record.
+        """
+        count = self.size
+        if not count:
+            return []
+        key = _event_id_key(event_id)
+        key = -1 if key is None else key
+        
+        with open(self.path, 'rb') as f:
+            sorted_keys = not self._read_flags(f) & self.FLAG_UNSORTED
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                def key_at(i: int) -> int:
+                    return self.RECORD.unpack_from(mm, self.HEADER.size + i * self.RECORD.size)[0]
+                
+                if not sorted_keys:
+                    candidates = range(count)
+                else:
+                    # Binary search for the first record with this key
+                    low, high = 0, count
+                    while low < high:
+                        middle = (low + high) // 2
+                        if key_at(middle) < key:
+                            low = middle + 1
+                        else:
+                            high = middle
+                    candidates = range(low, count)
+                
+                matches = []
+                for i in candidates:
+                    record_key, offset = self.RECORD.unpack_from(
+                        mm, self.HEADER.size + i * self.RECORD.size
+                    )
+                    if record_key == key:
+                        matches.append((i, offset))
+                    elif sorted_keys:
+                        break
+                return matches
+
+
+def _query_fields(event_dict: Dict[str, Any]) -> Dict[str, str]:
+    """Values of the secondary-indexed fields of an event"""
+    metadata = event_dict.get('metadata') or {}
+    if event_dict['event_type'] in NON_DECISION_EVENTS:
+        compliance = 'none'    # Matches neither is_compliant=True nor False
+    else:
+        compliance = 'true' if metadata.get('is_compliant', False) else 'false'
+    return {
+        'event_type': str(event_dict['event_type']),
+        'actor': str(event_dict['actor']),
+        'is_compliant': compliance
+    }
+
+
+class OPTRQueryIndex:
+    """
+    Secondary indexes for filtered range queries over the ledger
+    
+    - A sparse timestamp index (every TIMESTAMP_INTERVAL-th event) bounds a
+      time range to a span of event indexes without reading the ledger.
+    - Posting lists of (event index, byte offset) per event_type, actor and
+      compliance value select matching events, so only matching lines are
+      read and parsed.
+    """
+    
+    FIELDS = ('event_type', 'actor', 'is_compliant')
+    POSTING = struct.Struct('<QQ')       # event index, byte offset
+    TIMESTAMP = struct.Struct('<qQQ')    # timestamp (us), event index, byte offset
+    TIMESTAMP_INTERVAL = 64
+    
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.catalog_path = directory / "catalog.json"
+        self.timestamp_path = directory / "timestamps.bin"
+        # Present while records are written ahead of the catalog commit
+        self.pending_path = directory / "pending"
+        self.catalog = self._load_catalog()
+    
+    def _empty_catalog(self) -> Dict[str, Any]:
+        return {
+            'count': 0,
+            'next_offset': 0,
+            'last_timestamp': None,
+            'timestamps_sorted': True,
+            'values': {field: {} for field in self.FIELDS}
+        }
+    
+    def _load_catalog(self) -> Dict[str, Any]:
+        try:
+            with open(self.catalog_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self._empty_catalog()
+    
+    def _save_catalog(self) -> None:
+        with open(self.catalog_path, 'w') as f:
+            json.dump(self.catalog, f)
+    
+    @property
+    def size(self) -> int:
+        """Number of indexed events"""
+        return self.catalog['count']
+    
+    @property
+    def next_offset(self) -> int:
+        """Byte offset just past the last indexed event"""
+        return self.catalog['next_offset']
+    
+    def reset(self) -> None:
+        """Drop every index so it can be rebuilt from the ledger"""
+        for path in self.directory.glob("*.bin"):
+            path.unlink()
+        self.catalog = self._empty_catalog()
+        self._save_catalog()
+        self.pending_path.unlink(missing_ok=True)
+    
+    def _posting_path(self, field: str, value: str) -> Optional[Path]:
+        name = self.catalog['values'][field].get(value)
+        return self.directory / name if name else None
+    
+    def _discard_uncommitted(self) -> None:
+        """Trim records a crashed writer left past the committed count"""
+        count = self.catalog['count']
+        paths = [(self.timestamp_path, self.TIMESTAMP)] + [
+            (self.directory / name, self.POSTING)
+            for values in self.catalog['values'].values()
+            for name in values.values()
+        ]
+        for path, record in paths:
+            if not path.exists():
+                continue
+            with open(path, 'r+b') as f:
+                records = f.seek(0, os.SEEK_END) // record.size
+                while records:
+                    f.seek((records - 1) * record.size)
+                    index = record.unpack(f.read(record.size))[-2 if record is self.TIMESTAMP else 0]
+                    if index < count:
+                        break
+                    records -= 1
+                f.truncate(records * record.size)
+    
+    def add(self, entries: List[Tuple[int, Dict[str, Any]]], next_offset: int) -> None:
+        """
+        Index (byte offset, event dict) pairs for newly appended events
+        
+        Records are appended before the catalog commits them. Only when the
+        pending marker shows an earlier add never committed are the files
+        trimmed, so appends do not touch every posting list.
+        """
+        if not entries:
+            return
+        if self.pending_path.exists():
+            self._discard_uncommitted()
+        
+        index = self.catalog['count']
+        last_timestamp = self.catalog['last_timestamp']
+        timestamps = []
+        postings: Dict[Tuple[str, str], List[bytes]] = {}
+        
+        for offset, event_dict in entries:
+            timestamp = _timestamp_micros(event_dict['timestamp'])
+            if last_timestamp is not None and timestamp < last_timestamp:
+                self.catalog['timestamps_sorted'] = False
+            last_timestamp = timestamp
+            if index % self.TIMESTAMP_INTERVAL == 0:
+                timestamps.append(self.TIMESTAMP.pack(timestamp, index, offset))
+            
+            for field, value in _query_fields(event_dict).items():
+                postings.setdefault((field, value), []).append(
+                    self.POSTING.pack(index, offset)
+                )
+            index += 1
+        
+        self.pending_path.touch()
+        if timestamps:
+            with open(self.timestamp_path, 'ab') as f:
+                f.write(b''.join(timestamps))
+        for (field, value), records in postings.items():
+            path = self._posting_path(field, value)
+            if path is None:
+                digest = hashlib.sha1(value.encode()).hexdigest()[:16]
+                self.catalog['values'][field][value] = f"{field}-{digest}.bin"
+                path = self._posting_path(field, value)
+            with open(path, 'ab') as f:
+                f.write(b''.join(records))
+        
+        # The catalog commits the new records
+        self.catalog['count'] = index
+        self.catalog['next_offset'] = next_offset
+        self.catalog['last_timestamp'] = last_timestamp
+        self._save_catalog()
+        self.pending_path.unlink()
+    
+    def time_bounds(
+        self,
+        start: Optional[int],
+        end: Optional[int]
+    ) -> Tuple[int, int, int]:
+        """
+        Narrow a [start, end) timestamp range to an event index range
+        
+        Returns:
+            tuple: (first event index, its byte offset, end event index)
+        """
+        count = self.catalog['count']
+        if not self.catalog['timestamps_sorted'] or not self.timestamp_path.exists():
+            return 0, 0, count
+        
+        with open(self.timestamp_path, 'rb') as f:
+            if not f.seek(0, os.SEEK_END):
+                return 0, 0, count
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                records = len(mm) // self.TIMESTAMP.size
+                
+                def first_at_or_after(timestamp: int) -> int:
+                    first, last = 0, records
+                    while first < last:
+                        middle = (first + last) // 2
+                        if self.TIMESTAMP.unpack_from(mm, middle * self.TIMESTAMP.size)[0] < timestamp:
+                            first = middle + 1
+                        else:
+                            last = middle
+                    return first
+                
+                low, low_offset, high = 0, 0, count
+                if start is not None:
+                    # Everything before the last sample older than `start` is older too
+                    position = first_at_or_after(start) - 1
+                    if position >= 0:
+                        _, low, low_offset = self.TIMESTAMP.unpack_from(
+                            mm, position * self.TIMESTAMP.size
+                        )
+                if end is not None:
+                    position = first_at_or_after(end)
+                    if position < records:
+                        high = min(self.TIMESTAMP.unpack_from(
+                            mm, position * self.TIMESTAMP.size
+                        )[1], count)
+        
+        return low, low_offset, high
+    
+    def _search(self, mm, index: int) -> int:
+        """Position of the first posting at or after an event index"""
+        first, last = 0, len(mm) // self.POSTING.size
+        while first < last:
+            middle = (first + last) // 2
+            if self.POSTING.unpack_from(mm, middle * self.POSTING.size)[0] < index:
+                first = middle + 1
+            else:
+                last = middle
+        return first
+    
+    def _contains(self, mm, index: int) -> bool:
+        """Whether a posting list contains an event index"""
+        position = self._search(mm, index)
+        return (
+            position < len(mm) // self.POSTING.size
+            and self.POSTING.unpack_from(mm, position * self.POSTING.size)[0] == index
+        )
+    
+    def candidates(
+        self,
+        filters: Dict[str, str],
+        low: int,
+        high: int
+    ) -> List[Tuple[int, int]]:
+        """
+        (event index, byte offset) of events matching every filter in [low, high)
+        
+        The shortest posting list drives the intersection; membership in the
+        others is checked by binary search over their memory maps.
+        """
+        paths = []
+        for field, value in filters.items():
+            path = self._posting_path(field, value)
+            if path is None or not path.exists() or not path.stat().st_size:
+                return []
+            paths.append(path)
+        paths.sort(key=lambda path: path.stat().st_size)
+        
+        files = [open(path, 'rb') for path in paths]
+        maps = []
+        try:
+            for f in files:
+                maps.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            
+            driver, others = maps[0], maps[1:]
+            result = []
+            for i in range(self._search(driver, low), len(driver) // self.POSTING.size):
+                index, offset = self.POSTING.unpack_from(driver, i * self.POSTING.size)
+                if index >= high:
+                    break
+                if all(self._contains(other, index) for other in others):
+                    result.append((index, offset))
+            return result
+        finally:
+            for mm in maps:
+                mm.close()
+            for f in files:
+                f.close()
+
+
+class OPTRComplianceStats:
+    """
+    Running compliance aggregates persisted in a sidecar
+    
+    Counters are keyed to the chain position they cover (event count, byte
+    offset and current_hash of the last counted event), so a reader can
+    tell whether they still describe the ledger. Per-actor, per-hour and
+    per-rule buckets hold [events, compliant] pairs; only the latest
+    STATS_HOURLY_BUCKETS hours are kept. Without a path the counters live
+    in memory only.
+    """
+    
+    def __init__(self, path: Optional[Path]):
+        self.path = path
+        self.data = self._load()
+        self._unsaved = 0
+    
+    @staticmethod
+    def _empty() -> Dict[str, Any]:
+        return {
+            'count': 0,
+            'size': 0,
+            'hash': GENESIS_HASH,
+            'first_hash': None,
+            'compliant': 0,
+            'non_decisions': 0,
+            'rule_sets': 0,
+            'actors': {},
+            'event_types': {},
+            'rules': {},
+            'hourly': {}
+        }
+    
+    def _load(self) -> Dict[str, Any]:
+        if self.path is None:
+            return self._empty()
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self._empty()
+        if 'non_decisions' not in data:
+            return self._empty()    # Counted bookkeeping events as decisions; rebuild
+        return data
+    
+    def refresh(self) -> None:
+        """Pick up aggregates saved by another process if they count further"""
+        data = self._load()
+        if data['count'] >= self.data['count']:
+            self.data = data
+    
+    def reset(self) -> None:
+        self.data = self._empty()
+    
+    def add(
+        self,
+        events: List[OPTREvent],
+        resolve_rules: Optional[Callable[[str], Optional[List[str]]]] = None
+    ) -> None:
+        """
+        Fold events into the counters (in chain order)
+        
+        Args:
+            events: Events to count
+            resolve_rules: Looks up rule sets referenced by content hash
+        """
+        data = self.data
+        hourly = data['hourly']
+        for event in events:
+            data['first_hash'] = data['first_hash'] or event.current_hash
+            if event.event_type in NON_DECISION_EVENTS:
+                data['non_decisions'] += 1
+                if event.event_type == RULE_SET_EVENT:
+                    data['rule_sets'] += 1
+                continue
+            
+            metadata = event.metadata or {}
+            compliant = 1 if metadata.get('is_compliant', False) else 0
+            
+            hour = event.timestamp[:13]
+            hour_bucket = hourly.get(hour)
+            if hour_bucket is None:
+                hour_bucket = hourly[hour] = [0, 0]
+                if len(hourly) > STATS_HOURLY_BUCKETS:
+                    del hourly[min(hourly)]
+            
+            buckets = [
+                data['actors'].setdefault(str(event.actor), [0, 0]),
+                data['event_types'].setdefault(str(event.event_type), [0, 0]),
+                hour_bucket
+            ]
+            rules = metadata.get('constitutional_rules')
+            if rules is None and resolve_rules is not None and 'constitutional_rules_ref' in metadata:
+                rules = resolve_rules(metadata['constitutional_rules_ref'])
+            if isinstance(rules, list):
+                buckets.extend(data['rules'].setdefault(str(rule), [0, 0]) for rule in rules)
+            for bucket in buckets:
+                bucket[0] += 1
+                bucket[1] += compliant
+            
+            data['compliant'] += compliant
+        data['count'] += len(events)
+    
+    def save(self, head: Dict[str, Any], force: bool = True) -> None:
+        """
+        Mark the counters as covering the ledger up to `head` and persist them
+        
+        Args:
+            head: Chain head the counters now describe
+            force: Write now; otherwise only every STATS_SAVE_EVERY calls
+        """
+        self.data['size'] = head['size']
+        self.data['hash'] = head['hash']
+        self._unsaved += 1
+        if self.path is None or (not force and self._unsaved < STATS_SAVE_EVERY):
+            return
+        self._unsaved = 0
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class OPTRColumns:
+    """
+    Columnar view of a ledger for vectorized analytics
+    
+    data is a NumPy structured array with one row per event (see
+    COLUMN_DTYPE); actor and event_type hold codes into the category lists.
+    Compliance rates are taken over the rows with is_decision set.
+    """
+    data: Any
+    actors: List[str]
+    event_types: List[str]
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
+    def to_arrow(self):
+        """Arrow table with dictionary-encoded actor/event_type columns"""
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("Arrow export requires pyarrow")
+        return pa.table({
+            'timestamp': pa.array(self.data['timestamp'], type=pa.timestamp('us', tz='UTC')),
+            'actor': pa.DictionaryArray.from_arrays(self.data['actor'], self.actors),
+            'event_type': pa.DictionaryArray.from_arrays(self.data['event_type'], self.event_types),
+            'is_decision': pa.array(self.data['is_decision']),
+            'is_compliant': pa.array(self.data['is_compliant']),
+            'input_length': pa.array(self.data['input_length']),
+        })
+    
+    def to_parquet(self, path: str) -> None:
+        """Write the columns to a Parquet file"""
+        pq.write_table(self.to_arrow(), path)
+
+
+class OPTRLedger:
+    """
+    Cryptographically hash-chained ledger for Constitutional AI enforcement
+    
+    Key Features:
+    - Tamper-evident: Any modification breaks the hash chain
+    - Append-only: Past events cannot be altered
+    - Verifiable: Third parties can validate integrity without system access
+    """
+    
+    def __init__(
+        self,
+        ledger_path: str = "optr_ledger.jsonl",
+        durability: str = DURABILITY_NONE,
+        multiprocess: bool = False,
+        merkle: bool = False,
+        index: bool = False,
+        query_index: bool = False,
+        stats: bool = False,
+        segment_max_bytes: Optional[int] = None,
+        segment_max_age: Optional[float] = None,
+        segment_compression: str = 'gzip',
+        record_format: Optional[str] = None,
+        hash_algorithm: Optional[str] = None,
+        blob_threshold: Optional[int] = None,
+        recover: bool = True,
+        read_only: bool = False
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        if hash_algorithm is not None and hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_algorithm}")
+        if segment_compression not in SEGMENT_COMPRESSION:
+            raise ValueError(f"Unsupported segment compression: {segment_compression}")
+        if multiprocess and not FCNTL_AVAILABLE:
+            raise RuntimeError("Multi-process ledgers require fcntl file locking")
+        if read_only and (merkle or index or query_index or stats):
+            raise ValueError("Read-only ledgers (read_only=True) cannot maintain sidecar indexes")
+        
+        # recover repairs a torn tail left by a crashed writer on open.
+        # read_only implies no recovery, no appends, and no sidecar is
+        # created or rewritten
+        self.read_only = read_only
+        self.recover = recover and not read_only
+        self.ledger_path = Path(ledger_path)
+        if not read_only:
+            self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self._sidecar_path('.meta.json')
+        self.format = LEDGER_FORMATS[self._resolve_format(record_format)]
+        self.genesis_hash_algorithm = self._read_meta().get('hash_algorithm', DEFAULT_HASH_ALGORITHM)
+        self.durability = durability
+        self.multiprocess = multiprocess
+        self.head_path = self._sidecar_path('.head')
+        self.lock_path = self._sidecar_path('.lock')
+        self.checkpoint_path = self._sidecar_path('.checkpoints')
+        self.merkle_tree = OPTRMerkleTree(self._sidecar_path('.merkle')) if merkle else None
+        self.event_index = OPTREventIndex(self._sidecar_path('.idx')) if index else None
+        self.query_index = OPTRQueryIndex(self._sidecar_path('.qidx')) if query_index else None
+        self.stats = OPTRComplianceStats(self._sidecar_path('.stats')) if stats else None
+        self.segment_dir = self._sidecar_path('.segments')
+        self.manifest_path = self.segment_dir / "manifest.json"
+        self.consumer_dir = self._sidecar_path('.consumers')
+        self.rule_set_path = self._sidecar_path('.rulesets')
+        self.blob_dir = self._sidecar_path('.blobs')
+        self.blob_threshold = blob_threshold
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.segment_compression = segment_compression
+        self._head: Optional[Dict[str, Any]] = None
+        self._thread_lock = threading.Lock()
+        self._lock_file = None
+        self._lock_pid: Optional[int] = None
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_stamp: Optional[Tuple[int, int]] = None
+        self._segment_cache: Optional[Tuple[str, bytes]] = None
+        self._rule_sets: Dict[str, List[str]] = {}
+        self.recovery: Optional[Dict[str, Any]] = None
+        
+        # Recovery truncates, so it always waits for appends in flight in
+        # other processes, whatever this instance's own multiprocess mode
+        if self.recover and (self.manifest_path.exists() or self.ledger_path.exists()):
+            with self._append_lock(cross_process=FCNTL_AVAILABLE):
+                if self.manifest_path.exists():
+                    self._recover_rotation()
+                self.recovery = self._recover_torn_tail()
+        
+        if hash_algorithm is not None and not read_only:
+            self._resolve_hash_algorithm(hash_algorithm)
+    
+    def _sidecar_path(self, suffix: str) -> Path:
+        """Path of a sidecar file stored next to the ledger"""
+        return self.ledger_path.with_name(self.ledger_path.name + suffix)
+    
+    def _read_meta(self) -> Dict[str, Any]:
+        """Ledger-level settings stored in the .meta.json sidecar"""
+        try:
+            with open(self.meta_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+    
+    def _resolve_format(self, record_format: Optional[str]) -> str:
+        """
+        Pick the on-disk record format, recording non-default choices
+        
+        Ledgers without a meta record are JSONL; asking for a different
+        format than the one a ledger was created with is an error.
+        """
+        meta = self._read_meta()
+        stored = meta.get('format')
+        if record_format is None:
+            record_format = stored or JSONLRecordFormat.name
+        if record_format not in LEDGER_FORMATS:
+            raise ValueError(f"Unknown ledger format: {record_format}")
+        
+        existing = stored or (JSONLRecordFormat.name if self.ledger_path.exists() and self.ledger_path.stat().st_size else None)
+        if existing and existing != record_format:
+            raise ValueError(
+                f"{self.ledger_path} is a {existing} ledger; use convert_ledger() to change formats"
+            )
+        if stored is None and record_format != JSONLRecordFormat.name and not self.read_only:
+            meta['format'] = record_format
+            self._write_meta(meta)
+        return record_format
+    
+    def _resolve_hash_algorithm(self, hash_algorithm: str) -> None:
+        """
+        Record the hash algorithm of a new ledger in its meta record
+        
+        Existing ledgers keep the algorithm they are using; switching needs
+        an anchor event (migrate_hash_algorithm).
+        """
+        with self._append_lock():
+            head = self._load_head()
+            if head['count'] == 0:
+                meta = self._read_meta()
+                meta['hash_algorithm'] = hash_algorithm
+                self._write_meta(meta)
+                self.genesis_hash_algorithm = hash_algorithm
+                self._head = self._rebuild_head(head['size'])
+                self._write_head_record(self._head)
+            elif head['hash_algorithm'] != hash_algorithm:
+                raise ValueError(
+                    f"{self.ledger_path} is hashed with {head['hash_algorithm']}; "
+                    f"use migrate_hash_algorithm() to switch"
+                )
+    
+    @contextmanager
+    def _append_lock(self, cross_process: Optional[bool] = None):
+        """
+        Serialize the read-head/compute/append sequence
+        
+        Threads are always serialized. In multi-process mode an advisory
+        flock on the .lock sidecar serializes writers across processes; the
+        persisted head record then acts as the shared head cache, so a writer
+        that sees the ledger grew picks up the new head without a file scan.
+        cross_process overrides the multiprocess mode for a single section.
+        """
+        if cross_process is None:
+            cross_process = self.multiprocess
+        with self._thread_lock:
+            if not cross_process:
+                yield
+                return
+            
+            # flock is tied to the open file, so forked workers need their own
+            if self._lock_pid != os.getpid():
+                self._lock_file = open(self.lock_path, 'a')
+                self._lock_pid = os.getpid()
+            
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+    
+    @contextmanager
+    def _snapshot_lock(self):
+        """
+        Shared flock on the .lock sidecar while reading a consistent head
+        
+        Multi-process writers hold it exclusively for a whole append, so the
+        head and the ledger size agree under it. Without a lock file no such
+        writer exists; nothing is locked and no file is created.
+        """
+        lock_file = None
+        if FCNTL_AVAILABLE:
+            try:
+                lock_file = open(self.lock_path, 'rb')
+            except FileNotFoundError:
+                pass
+        if lock_file is None:
+            yield
+            return
+        
+        with lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _segments(self) -> List[Dict[str, Any]]:
+        """
+        Sealed segments in chain order, from the cached segment manifest
+        
+        Each segment records its event range, its span of the logical byte
+        address space (sealed segments followed by the active file) and the
+        hashes at its borders.
+        """
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            self._manifest, self._manifest_stamp = None, None
+            return []
+        
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if self._manifest_stamp != stamp:
+            with open(self.manifest_path, 'r') as f:
+                self._manifest = json.load(f)
+            self._manifest_stamp = stamp
+        return self._manifest['segments']
+    
+    def _write_manifest(self, segments: List[Dict[str, Any]]) -> None:
+        """Atomically replace the segment manifest"""
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        temporary = self.manifest_path.with_suffix('.tmp')
+        with open(temporary, 'w') as f:
+            json.dump({'segments': segments}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.manifest_path)
+    
+    def _active_base(self) -> int:
+        """Logical byte offset at which the active ledger file starts"""
+        segments = self._segments()
+        if not segments:
+            return 0
+        return segments[-1]['start'] + segments[-1]['size']
+    
+    def _active_size(self) -> int:
+        """Size of the active ledger file in bytes"""
+        try:
+            return self.ledger_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+    
+    def _ledger_size(self) -> int:
+        """Current logical size of the ledger (all segments) in bytes"""
+        return self._active_base() + self._active_size()
+    
+    def _parts(self) -> List[Tuple[int, int, str, str]]:
+        """(logical start, size, path, compression) of every segment and the active file"""
+        parts = [
+            (segment['start'], segment['size'], str(self.segment_dir / segment['file']), segment['compression'])
+            for segment in self._segments()
+        ]
+        parts.append((self._active_base(), self._active_size(), str(self.ledger_path), 'none'))
+        return parts
+    
+    def _segment_bytes(self, path: str, compression: str) -> bytes:
+        """Decompressed contents of a sealed segment (the last one is cached)"""
+        if self._segment_cache is None or self._segment_cache[0] != path:
+            with _open_segment(path, compression) as f:
+                self._segment_cache = (path, f.read())
+        return self._segment_cache[1]
+    
+    def _rotate_if_needed(self, head: Dict[str, Any]) -> None:
+        """Seal the active file into a compressed segment once it is too big or old"""
+        active_size = self._active_size()
+        if not active_size:
+            return
+        
+        rotate = bool(self.segment_max_bytes and active_size >= self.segment_max_bytes)
+        if not rotate and self.segment_max_age:
+            with open(self.ledger_path, 'rb') as f:
+                _, first_event = next(self.format.iter_records(f))
+            age = time.time() - _timestamp_micros(first_event['timestamp']) / 1e6
+            rotate = age >= self.segment_max_age
+        if rotate:
+            self._seal_active_segment(head)
+    
+    def _seal_active_segment(self, head: Dict[str, Any]) -> None:
+        """
+        Compress the active file into a sealed segment and start a new one
+        
+        The segment is written and fsynced before the manifest is replaced,
+        and the active file is only truncated afterwards, so a crash at any
+        point leaves either the old layout or a duplicate that
+        _recover_rotation removes.
+        """
+        segments = list(self._segments())
+        sealed_events = sum(segment['count'] for segment in segments)
+        suffix, opener = SEGMENT_COMPRESSION[self.segment_compression]
+        name = f"segment-{len(segments) + 1:06d}.{self.format.extension}{suffix}"
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        
+        temporary = self.segment_dir / (name + '.tmp')
+        with open(self.ledger_path, 'rb') as source:
+            _, first_event = next(self.format.iter_records(source))
+            source.seek(0)
+            with opener(temporary, 'wb') as target:
+                shutil.copyfileobj(source, target)
+        with open(temporary, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(temporary, self.segment_dir / name)
+        
+        segments.append({
+            'file': name,
+            'compression': self.segment_compression,
+            'first_index': sealed_events,
+            'count': head['count'] - sealed_events,
+            'start': self._active_base(),
+            'size': self._active_size(),
+            'first_previous_hash': first_event['previous_hash'],
+            'last_hash': head['hash'],
+            'sealed_at': datetime.utcnow().isoformat() + 'Z'
+        })
+        self._write_manifest(segments)
+        os.truncate(self.ledger_path, 0)
+    
+    def _recover_rotation(self) -> None:
+        """Drop an active file left behind by a rotation interrupted after sealing"""
+        segments = self._segments()
+        if not segments or not self._active_size():
+            return
+        
+        try:
+            with open(self.ledger_path, 'rb') as f:
+                last = next(self.format.reverse_records(f, self._active_size()), None)
+        except (ValueError, struct.error):
+            return  # A torn tail; a leftover copy of a sealed segment is complete
+        if last and last[1]['current_hash'] == segments[-1]['last_hash']:
+            os.truncate(self.ledger_path, 0)
+    
+    def _recover_torn_tail(self) -> Optional[Dict[str, Any]]:
+        """
+        Repair the end of the active file after a crash during an append
+        
+        The head record is written after the data, so it marks the last
+        committed record boundary and only the bytes past it are inspected.
+        Complete records there are kept; anything after the last complete
+        record is moved to a <ledger>.torn.<timestamp> file and truncated, and
+        the tail is checked to link to the hash before it. Without a head
+        record the end is located from EOF (JSONL) or by walking record
+        lengths (binary).
+        
+        Returns:
+            dict: Recovery summary when bytes were quarantined or the tail
+                does not link, otherwise None
+        """
+        base = self._active_base()
+        end = self._active_size()
+        head = self._read_head_record()
+        if head is not None and head['size'] == base + end:
+            return None
+        if head is not None and not base <= head['size'] <= base + end:
+            head = None
+        start = head['size'] - base if head is not None else 0
+        
+        with open(self.ledger_path, 'rb') as f:
+            complete_end = self.format.complete_end(f, start, end)
+            f.seek(complete_end)
+            torn = f.read(end - complete_end)
+            
+            # Re-check the records of the interrupted batch, or the last one
+            if head is not None:
+                expected_hash = head['hash']
+                records = (event_dict for _, event_dict in self.format.iter_records(f, start, complete_end))
+            else:
+                segments = self._segments()
+                expected_hash = segments[-1]['last_hash'] if segments else GENESIS_HASH
+                records = []
+                try:
+                    for _, event_dict in self.format.reverse_records(f, complete_end):
+                        records.insert(0, event_dict)
+                        if len(records) == 2:
+                            break
+                except (ValueError, struct.error):
+                    records = None
+                if records and len(records) == 2:
+                    expected_hash = records.pop(0)['current_hash']
+            
+            linked = records is not None
+            recovered = 0
+            last_event = None
+            algorithm = head['hash_algorithm'] if head is not None else None
+            try:
+                for event_dict in records or ():
+                    event = OPTREvent(**event_dict)
+                    if algorithm is None:
+                        algorithm = _match_hash_algorithm(event, self.genesis_hash_algorithm) or self.genesis_hash_algorithm
+                    if event.previous_hash != expected_hash or _calculate_event_hash(event, algorithm) != event.current_hash:
+                        linked = False
+                        break
+                    expected_hash = event.current_hash
+                    algorithm = _next_hash_algorithm(event, algorithm)
+                    last_event = event
+                    recovered += 1
+            except (ValueError, TypeError, struct.error):
+                linked = False
+        
+        quarantine_path = None
+        if torn:
+            stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%fZ')
+            quarantine_path = self._sidecar_path(f".torn.{stamp}")
+            with open(quarantine_path, 'wb') as f:
+                f.write(torn)
+                f.flush()
+                os.fsync(f.fileno())
+            os.truncate(self.ledger_path, complete_end)
+        
+        self._head = None
+        if head is not None and linked:
+            # Records of the interrupted batch were written in full; keep them
+            self._head = {
+                'hash': expected_hash,
+                'size': base + complete_end,
+                'count': head['count'] + recovered,
+                'event_id': last_event.event_id if last_event else head['event_id'],
+                'hash_algorithm': algorithm
+            }
+            self._write_head_record(self._head)
+        
+        if not torn and linked:
+            return None
+        return {
+            'truncated_bytes': len(torn),
+            'quarantine_path': str(quarantine_path) if quarantine_path else None,
+            'recovered_events': recovered if head is not None else 0,
+            'tail_linked': linked
+        }
+    
+    def _get_last_hash(self) -> str:
+        """Retrieve the hash of the last event in the ledger"""
+        return self._load_head()['hash']
+    
+    def _load_head(self) -> Dict[str, Any]:
+        """
+        Return the chain head (last hash, ledger size, event count)
+        
+        The head is cached in memory and persisted to a small sidecar record.
+        Both are only trusted while they describe the current ledger size;
+        otherwise the head is rebuilt from the end of the ledger.
+        """
+        size = self._ledger_size()
+        if self._head is not None and self._head['size'] == size:
+            return self._head
+        
+        head = self._read_head_record()
+        if head is None or head['size'] != size:
+            if not self.read_only:
+                head = self._rebuild_head(size)
+                self._write_head_record(head)
+            else:
+                # Read-only: stop at the last complete record, leaving a torn
+                # or in-flight tail alone
+                committed = self._committed_size(head)
+                if head is None or head['size'] != committed:
+                    head = self._rebuild_head(committed)
+        
+        self._head = head
+        return head
+    
+    def _committed_size(self, head: Optional[Dict[str, Any]]) -> int:
+        """Logical size up to the last complete record, resuming at head when it fits"""
+        base = self._active_base()
+        end = self._active_size()
+        start = 0
+        if head is not None and base <= head['size'] <= base + end:
+            start = head['size'] - base
+        if start == end:
+            return base + end
+        with open(self.ledger_path, 'rb') as f:
+            return base + self.format.complete_end(f, start, end)
+    
+    def _read_head_record(self) -> Optional[Dict[str, Any]]:
+        """Read the persisted head record, or None if missing or unreadable"""
+        try:
+            with open(self.head_path, 'r') as f:
+                head = json.load(f)
+            algorithm = head.get('hash_algorithm', self.genesis_hash_algorithm)
+            if algorithm not in HASH_ALGORITHMS:
+                return None
+            return {
+                'hash': str(head['hash']),
+                'size': int(head['size']),
+                'count': int(head['count']),
+                'event_id': str(head['event_id']),
+                'hash_algorithm': algorithm
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+    
+    def _write_head_record(self, head: Dict[str, Any]) -> None:
+        """Persist the head record next to the ledger"""
+        with open(self.head_path, 'w') as f:
+            json.dump(head, f)
+    
+    def _rebuild_head(self, size: int) -> Dict[str, Any]:
+        """Recover the head from the ledger itself when the record is stale"""
+        last_event = self._read_last_event(size) if size else None
+        if last_event is None:
+            return {
+                'hash': GENESIS_HASH,
+                'size': size,
+                'count': 0,
+                'event_id': '',
+                'hash_algorithm': self.genesis_hash_algorithm
+            }
+        
+        event = OPTREvent(**last_event)
+        algorithm = _match_hash_algorithm(event, self.genesis_hash_algorithm) or self.genesis_hash_algorithm
+        return {
+            'hash': event.current_hash,
+            'size': size,
+            'count': self._count_records(size),
+            'event_id': event.event_id,
+            'hash_algorithm': _next_hash_algorithm(event, algorithm)
+        }
+    
+    def _iter_records(
+        self,
+        start: int = 0,
+        end: Optional[int] = None,
+        raw: bool = False
+    ) -> Iterator[Tuple[int, Any]]:
+        """
+        Stream (logical byte offset, event dict) pairs in chain order, stopping before end
+        
+        With raw, records are yielded undecoded (bytes) for format.decode
+        """
+        iter_records = self.format.iter_raw_records if raw else self.format.iter_records
+        for base, size, path, compression in self._parts():
+            if end is not None and base >= end:
+                break
+            if base + size <= start or not os.path.exists(path):
+                continue
+            
+            with _open_segment(path, compression) as f:
+                local_end = None if end is None else end - base
+                for offset, record in iter_records(f, max(start - base, 0), local_end):
+                    yield base + offset, record
+    
+    def _iter_records_reverse(self, end: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Stream (logical byte offset, event dict) pairs backwards from EOF
+        
+        The active file is read in fixed blocks (or through mmap); sealed
+        segments are decompressed whole, which their size bound keeps cheap.
+        
+        Args:
+            end: Treat this logical byte offset as EOF instead of the ledger's end
+        """
+        for base, size, path, compression in reversed(self._parts()):
+            if end is not None and base >= end:
+                continue
+            local_end = size if end is None else min(end - base, size)
+            
+            if compression == 'none':
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'rb') as f:
+                    for offset, event_dict in self.format.reverse_records(f, local_end):
+                        yield base + offset, event_dict
+            else:
+                data = io.BytesIO(self._segment_bytes(path, compression))
+                for offset, event_dict in self.format.reverse_records(data, local_end):
+                    yield base + offset, event_dict
+    
+    def _read_last_event(self, end: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read the last event with a bounded reverse read from EOF
+        
+        Args:
+            end: Treat this logical byte offset as EOF instead of the ledger's end
+        """
+        for _, event_dict in self._iter_records_reverse(end):
+            return event_dict
+        return None
+    
+    def _count_records(self, end: Optional[int] = None) -> int:
+        """Count the ledger's events (up to a logical offset) without decoding sealed segments"""
+        sealed = sum(segment['count'] for segment in self._segments())
+        if not self.ledger_path.exists():
+            return sealed
+        with open(self.ledger_path, 'rb') as f:
+            if end is None:
+                return sealed + self.format.count_records(f)
+            return sealed + self.format.count_records(f, 0, end - self._active_base())
+    
+    def _calculate_hash(self, event: OPTREvent, algorithm: Optional[str] = None) -> str:
+        """Calculate the chain hash for an event (genesis algorithm by default)"""
+        return _calculate_event_hash(event, algorithm or self.genesis_hash_algorithm)
+    
+    @staticmethod
+    def _encode_event_fields(spec: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        JSON-encode the fields of a new event that do not depend on the chain
+        
+        Returns the fragments of OPTREvent.canonical_json() around the event
+        ID and previous hash, so that only the event ID, timestamp and hashes
+        have to be spliced in while holding the append lock.
+        """
+        canonical_head = (
+            '{"action": ' + _json_value(spec['action'])
+            + ', "actor": ' + _json_value(spec['actor'])
+            + ', "decision": ' + _json_value(spec.get('decision'))
+            + ', "event_id": "'
+        )
+        canonical_body = (
+            '", "event_type": ' + _json_value(spec['event_type'])
+            + ', "input": ' + _json_value(spec.get('input_data'))
+            + ', "metadata": ' + _json_value(spec.get('metadata') or {})
+            + ', "previous_hash": "'
+        )
+        return canonical_head, canonical_body
+    
+    @staticmethod
+    def _next_event_id(last_event_id: str) -> str:
+        """
+        Generate a millisecond event ID that is unique within the ledger
+        
+        IDs stay in the evt_<epoch ms> format but are bumped past the previous
+        ID when several events are appended within the same millisecond.
+        """
+        millis = int(datetime.utcnow().timestamp() * 1000)
+        try:
+            last_millis = int(last_event_id[len("evt_"):])
+        except ValueError:
+            last_millis = -1
+        return f"evt_{max(millis, last_millis + 1)}"
+    
+    def append_event(
+        self,
+        event_type: str,
+        actor: str,
+        action: str,
+        input_data: Optional[str] = None,
+        decision: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> OPTREvent:
+        """
+        Append a new event to the ledger with cryptographic hash chain
+        
+        This creates a tamper-evident record that can be independently verified
+        by third parties, enabling scalable oversight without system access.
+        """
+        return self.append_events([{
+            'event_type': event_type,
+            'actor': actor,
+            'action': action,
+            'input_data': input_data,
+            'decision': decision,
+            'metadata': metadata
+        }])[0]
+    
+    def append_events(
+        self,
+        batch: List[Dict[str, Any]],
+        durability: Optional[str] = None
+    ) -> List[OPTREvent]:
+        """
+        Append a batch of events with a single write (group commit)
+        
+        Each entry takes the same keys as append_event's arguments. Hashes are
+        chained in memory, the whole batch is written with one buffered write,
+        and fsync is issued according to the durability mode.
+        
+        Args:
+            batch: Event specifications (event_type, actor, action and
+                optionally input_data, decision, metadata)
+            durability: Override the ledger's durability mode for this batch
+            
+        Returns:
+            list: The appended events, in chain order
+            
+        Raises:
+            InvalidEventError: A specification is malformed; nothing was written
+        """
+        if self.read_only:
+            raise RuntimeError("Ledger is open read-only (read_only=True)")
+        durability = durability or self.durability
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        if not batch:
+            return []
+        
+        for spec in batch:
+            if spec.get('event_type') == HASH_MIGRATION_EVENT:
+                target = (spec.get('metadata') or {}).get('hash_algorithm')
+                if target not in HASH_ALGORITHMS:
+                    raise InvalidEventError(f"Unsupported hash algorithm: {target}")
+            elif spec.get('event_type') == RULE_SET_EVENT:
+                metadata = spec.get('metadata') or {}
+                rules = metadata.get('constitutional_rules')
+                if not isinstance(rules, list) or metadata.get('rule_set_hash') != _rule_set_hash(rules):
+                    raise InvalidEventError("Rule set registrations need constitutional_rules and their rule_set_hash")
+            if BLOB_OFFLOADED_KEY in (spec.get('metadata') or {}):
+                self._check_offloaded(spec)
+        
+        if self.blob_threshold is not None:
+            batch = [self._offload_payloads(spec, durability) for spec in batch]
+        
+        # Encode everything that does not depend on the chain head up front,
+        # so concurrent writers hold the lock only to link and write
+        try:
+            encoded = [self._encode_event_fields(spec) for spec in batch]
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidEventError(f"Malformed event specification: {e!r}") from e
+        
+        with self._append_lock():
+            # Get previous hash to maintain chain
+            head = self._load_head()
+            if self.segment_max_bytes or self.segment_max_age:
+                self._rotate_if_needed(head)
+            previous_hash = head['hash']
+            event_id = head['event_id']
+            algorithm = head['hash_algorithm']
+            
+            events = []
+            lines = []
+            for spec, (canonical_head, canonical_body) in zip(batch, encoded):
+                event_id = self._next_event_id(event_id)
+                timestamp = datetime.utcnow().isoformat() + 'Z'
+                
+                # The canonical JSON is both the hash input and the ledger line
+                canonical = (
+                    canonical_head + event_id + canonical_body
+                    + previous_hash + '", "timestamp": "' + timestamp + '"}'
+                )
+                current_hash = HASH_ALGORITHMS[algorithm]((previous_hash + canonical).encode()).hexdigest()
+                
+                events.append(OPTREvent(
+                    timestamp=timestamp,
+                    event_id=event_id,
+                    event_type=spec['event_type'],
+                    actor=spec['actor'],
+                    action=spec['action'],
+                    input=spec.get('input_data'),
+                    decision=spec.get('decision'),
+                    metadata=spec.get('metadata') or {},
+                    previous_hash=previous_hash,
+                    current_hash=current_hash
+                ))
+                if self.format is JSONLRecordFormat:
+                    lines.append(_ledger_line(canonical, current_hash))
+                else:
+                    lines.append(self.format.encode(events[-1]))
+                previous_hash = current_hash
+                algorithm = _next_hash_algorithm(events[-1], algorithm)
+            
+            # Append to the active ledger file
+            with open(self.ledger_path, 'ab') as f:
+                if durability == DURABILITY_EVENT:
+                    for line in lines:
+                        f.write(line)
+                        f.flush()
+                        os.fsync(f.fileno())
+                else:
+                    f.write(b''.join(lines))
+                    if durability == DURABILITY_BATCH:
+                        f.flush()
+                        os.fsync(f.fileno())
+            
+            # Advance the chain head
+            self._head = {
+                'hash': previous_hash,
+                'size': head['size'] + sum(len(line) for line in lines),
+                'count': head['count'] + len(events),
+                'event_id': event_id,
+                'hash_algorithm': algorithm
+            }
+            self._write_head_record(self._head)
+            
+            if self.merkle_tree is not None:
+                self._sync_merkle_tree(head['count'])
+                self.merkle_tree.append([event.current_hash for event in events])
+            
+            if self.event_index is not None:
+                self._sync_event_index(head['count'])
+                offset = head['size']
+                entries = []
+                for event, line in zip(events, lines):
+                    entries.append((event.event_id, offset))
+                    offset += len(line)
+                self.event_index.append(entries)
+            
+            if self.query_index is not None:
+                self._sync_query_index(head['count'])
+                offset = head['size']
+                entries = []
+                for event, line in zip(events, lines):
+                    entries.append((offset, {
+                        'timestamp': event.timestamp,
+                        'event_type': event.event_type,
+                        'actor': event.actor,
+                        'metadata': event.metadata
+                    }))
+                    offset += len(line)
+                self.query_index.add(entries, offset)
+            
+            # Rule set registrations are always indexed so references resolve
+            registrations = {}
+            offset = head['size']
+            for event, line in zip(events, lines):
+                if event.event_type == RULE_SET_EVENT:
+                    registrations.setdefault(event.metadata['rule_set_hash'], offset)
+                    self._rule_sets[event.metadata['rule_set_hash']] = event.metadata['constitutional_rules']
+                offset += len(line)
+            if registrations:
+                self._write_rule_set_offsets({**self._load_rule_set_offsets(), **registrations})
+            
+            if self.stats is not None:
+                self._sync_stats(head)
+                self.stats.add(events, self.rule_set)
+                self.stats.save(self._head, force=False)
+        
+        return events
+    
+    def _check_offloaded(self, spec: Dict[str, Any]) -> None:
+        """
+        Accept a caller-supplied offloaded list only for references into this store
+        
+        Raises:
+            InvalidEventError: A listed field is unknown, is not a blob
+                reference, or names a blob this ledger does not hold
+        """
+        metadata = spec['metadata']
+        offloaded = metadata[BLOB_OFFLOADED_KEY]
+        if not isinstance(offloaded, list) or not set(offloaded) <= set(BLOB_FIELDS.values()):
+            raise InvalidEventError(f"metadata['{BLOB_OFFLOADED_KEY}'] must list offloaded event fields")
+        for key, field in BLOB_FIELDS.items():
+            if field not in offloaded:
+                continue
+            reference = _parse_blob_ref(metadata, field, spec.get(key))
+            if not reference[0] or not _blob_path(self.blob_dir, reference[0]).exists():
+                raise InvalidEventError(f"Offloaded {field} is not a reference into {self.blob_dir}")
+    
+    def _offload_payloads(self, spec: Dict[str, Any], durability: str) -> Dict[str, Any]:
+        """
+        Move large input/decision payloads into the blob store
+        
+        Blobs are named by the SHA-256 of their UTF-8 bytes, so identical
+        payloads are stored once, and they are written before the event that
+        references them. Replaced fields are listed in the event's metadata.
+        """
+        spec = dict(spec)
+        offloaded = list((spec.get('metadata') or {}).get(BLOB_OFFLOADED_KEY) or [])
+        for key, field in BLOB_FIELDS.items():
+            value = spec.get(key)
+            if not isinstance(value, str) or field in offloaded:
+                continue
+            payload = value.encode()
+            if len(payload) <= self.blob_threshold:
+                continue
+            
+            digest = hashlib.sha256(payload).hexdigest()
+            path = _blob_path(self.blob_dir, digest)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    if durability != DURABILITY_NONE:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            spec[key] = f"{BLOB_REF_PREFIX}{digest}:{len(value)}"
+            offloaded.append(field)
+        
+        if offloaded:
+            spec['metadata'] = {**(spec.get('metadata') or {}), BLOB_OFFLOADED_KEY: offloaded}
+        return spec
+    
+    def load_payload(self, event: OPTREvent, field: str) -> Optional[str]:
+        """
+        Return an event's input or decision with a blob reference resolved
+        
+        Fields not listed as offloaded are returned unchanged. Blob contents
+        are checked against their digest.
+        
+        Args:
+            event: Event read from this ledger
+            field: 'input' or 'decision'
+        
+        Raises:
+            ValueError: The blob is missing or does not match its digest
+        """
+        value = getattr(event, field)
+        reference = _parse_blob_ref(event.metadata, field, value)
+        if reference is None:
+            return value
+        digest = reference[0]
+        if not digest:
+            raise ValueError(f"Offloaded {field} of {event.event_id} is not a blob reference")
+        try:
+            with open(_blob_path(self.blob_dir, digest), 'rb') as f:
+                payload = f.read()
+        except FileNotFoundError:
+            raise ValueError(f"Blob {digest} is missing from {self.blob_dir}")
+        if hashlib.sha256(payload).hexdigest() != digest:
+            raise ValueError(f"Blob {digest} does not match its digest")
+        return payload.decode()
+    
+    def load_input(self, event: OPTREvent) -> Optional[str]:
+        """The event's input, fetched from the blob store if it was offloaded"""
+        return self.load_payload(event, 'input')
+    
+    def load_decision(self, event: OPTREvent) -> Optional[str]:
+        """The event's decision, fetched from the blob store if it was offloaded"""
+        return self.load_payload(event, 'decision')
+    
+    @property
+    def hash_algorithm(self) -> str:
+        """Hash algorithm used for the next appended event"""
+        with self._append_lock():
+            return self._load_head()['hash_algorithm']
+    
+    def migrate_hash_algorithm(self, hash_algorithm: str, actor: str = "optr_ledger") -> OPTREvent:
+        """
+        Switch the chain to another hash algorithm from the next event on
+        
+        Appends an anchor event, hashed with the current algorithm, that
+        names the new one. Later events are hashed with the new algorithm
+        and link to the anchor, so the full history stays verifiable and
+        the switch is recorded in the chain itself.
+        
+        Returns:
+            OPTREvent: The anchor event
+        """
+        if hash_algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported hash algorithm: {hash_algorithm}")
+        current = self.hash_algorithm
+        if current == hash_algorithm:
+            raise ValueError(f"Ledger is already hashed with {hash_algorithm}")
+        
+        return self.append_event(
+            event_type=HASH_MIGRATION_EVENT,
+            actor=actor,
+            action="migrate_hash_algorithm",
+            metadata={'hash_algorithm': hash_algorithm, 'previous_hash_algorithm': current}
+        )
+    
+    def _load_rule_set_offsets(self) -> Dict[str, int]:
+        """Rule set hash -> logical offset of its registration event"""
+        try:
+            with open(self.rule_set_path, 'r') as f:
+                return {str(key): int(offset) for key, offset in json.load(f).items()}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+    
+    def _write_rule_set_offsets(self, offsets: Dict[str, int]) -> None:
+        tmp_path = self.rule_set_path.with_name(self.rule_set_path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(offsets, f)
+        os.replace(tmp_path, self.rule_set_path)
+    
+    def _rule_set_at(self, offset: int, rule_set_hash: str) -> Optional[List[str]]:
+        """Rules registered at an offset, if that record still registers them"""
+        try:
+            event_dict = self._read_record_at(offset)
+        except (ValueError, struct.error):
+            return None
+        metadata = event_dict.get('metadata') or {}
+        rules = metadata.get('constitutional_rules')
+        if (
+            event_dict.get('event_type') != RULE_SET_EVENT
+            or not isinstance(rules, list)
+            or _rule_set_hash(rules) != rule_set_hash
+        ):
+            return None
+        return rules
+    
+    def rule_set(self, rule_set_hash: str, rebuild: bool = True) -> Optional[List[str]]:
+        """
+        Resolve a rule set reference to its rules
+        
+        Registrations are located through the .rulesets sidecar and checked
+        against their content hash. A missing or stale sidecar is rebuilt
+        from the ledger once per miss unless rebuild is False.
+        """
+        rules = self._rule_sets.get(rule_set_hash)
+        if rules is not None:
+            return rules
+        
+        offset = self._load_rule_set_offsets().get(rule_set_hash)
+        if offset is not None:
+            rules = self._rule_set_at(offset, rule_set_hash)
+        if rules is None and rebuild:
+            offsets = {}
+            for record_offset, event_dict in self._iter_records():
+                if event_dict['event_type'] == RULE_SET_EVENT:
+                    offsets.setdefault((event_dict['metadata'] or {}).get('rule_set_hash'), record_offset)
+            offsets.pop(None, None)
+            if not self.read_only:
+                self._write_rule_set_offsets(offsets)
+            if rule_set_hash in offsets:
+                rules = self._rule_set_at(offsets[rule_set_hash], rule_set_hash)
+        
+        if rules is not None:
+            self._rule_sets[rule_set_hash] = rules
+        return rules
+    
+    def register_rule_set(self, rules: List[str], actor: str = "constitutional_ai_enforcer") -> str:
+        """
+        Record a rule set once and return the content hash that references it
+        
+        Decision events store the hash in metadata['constitutional_rules_ref']
+        instead of repeating the rules. Concurrent first registrations of the
+        same rule set may both be written; either resolves.
+        """
+        rules = list(rules)
+        rule_set_hash = _rule_set_hash(rules)
+        if self.rule_set(rule_set_hash, rebuild=False) is None:
+            self.append_event(
+                event_type=RULE_SET_EVENT,
+                actor=actor,
+                action="register_rule_set",
+                metadata={'rule_set_hash': rule_set_hash, 'constitutional_rules': rules}
+            )
+        return rule_set_hash
+    
+    def constitutional_rules(self, event: OPTREvent) -> Optional[List[str]]:
+        """Rules a decision was checked against, inline or referenced by hash"""
+        metadata = event.metadata or {}
+        if 'constitutional_rules' in metadata:
+            return metadata['constitutional_rules']
+        if 'constitutional_rules_ref' in metadata:
+            return self.rule_set(metadata['constitutional_rules_ref'])
+        return None
+    
+    def _sync_merkle_tree(self, event_count: int) -> None:
+        """Bring the Merkle tree back in step with the first event_count events"""
+        # Leaves alone do not show an append interrupted between levels
+        self.merkle_tree.repair()
+        if self.merkle_tree.size == event_count:
+            return
+        if self.merkle_tree.size > event_count:
+            self.merkle_tree.reset()
+        
+        # Stream the missing leaves in bounded batches
+        skip = self.merkle_tree.size
+        pending = []
+        for _, event_dict in self._iter_records():
+            if skip:
+                skip -= 1
+                continue
+            pending.append(event_dict['current_hash'])
+            if len(pending) == event_count - self.merkle_tree.size:
+                break
+            if len(pending) >= 4096:
+                self.merkle_tree.append(pending)
+                pending = []
+        self.merkle_tree.append(pending)
+    
+    def _sync_event_index(self, event_count: int) -> None:
+        """Bring the event index back in step with the first event_count events"""
+        if self.read_only:
+            return  # Read-only: an index is used only as far as it already reaches
+        indexed = self.event_index.size
+        if indexed == event_count:
+            return
+        if indexed > event_count:
+            self.event_index.reset()
+            indexed = 0
+        
+        # Resume right after the last indexed event
+        start = 0
+        skip = 0
+        if indexed:
+            start = self.event_index.offset_at(indexed - 1)
+            skip = 1
+        
+        pending = []
+        for offset, event_dict in self._iter_records(start):
+            if skip:
+                skip -= 1
+                continue
+            pending.append((event_dict['event_id'], offset))
+            if indexed + len(pending) == event_count:
+                break
+            if len(pending) >= 4096:
+                self.event_index.append(pending)
+                indexed += len(pending)
+                pending = []
+        self.event_index.append(pending)
+    
+    def rebuild_index(self) -> None:
+        """Rebuild the event index from the ledger"""
+        if self.event_index is None:
+            raise RuntimeError("Event index is disabled for this ledger (index=False)")
+        with self._append_lock():
+            self.event_index.reset()
+            self._sync_event_index(self._load_head()['count'])
+    
+    def _read_record_at(self, offset: int) -> Dict[str, Any]:
+        """Read the event whose record starts at a logical byte offset"""
+        for base, size, path, compression in reversed(self._parts()):
+            if offset < base:
+                continue
+            if compression != 'none':
+                data = io.BytesIO(self._segment_bytes(path, compression))
+                return self.format.record_at(data, offset - base)
+            with open(path, 'rb') as f:
+                return self.format.record_at(f, offset - base)
+        raise ValueError(f"Offset {offset} is outside the ledger")
+    
+    def _record_from(self, position: int, floor: int, end: int) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Find the first record starting at or after a logical byte offset
+        
+        Args:
+            position: Logical byte offset to resynchronize from
+            floor: A known record boundary at or before position; formats
+                that cannot resynchronize on their own walk from there
+            end: Committed ledger size; records from here on are ignored
+        
+        Returns:
+            tuple: (logical offset, event dict), or (end, None) past the last record
+        """
+        for base, size, path, compression in self._parts():
+            if position >= base + size:
+                continue
+            if base >= end:
+                break
+            
+            local = max(position - base, 0)
+            if compression != 'none':
+                f = io.BytesIO(self._segment_bytes(path, compression))
+            else:
+                f = open(path, 'rb')
+            with f:
+                boundary = self.format.next_boundary(f, local, max(floor - base, 0)) if local else 0
+                if boundary < size and base + boundary < end:
+                    return base + boundary, self.format.record_at(f, boundary)
+        return end, None
+    
+    def _count_before(self, offset: int) -> int:
+        """
+        Number of events whose records start before a logical record boundary
+        
+        Uses the event index when enabled; otherwise counting starts at the
+        enclosing segment or the nearest trusted checkpoint, whichever is
+        later, so only the records between it and offset are walked.
+        """
+        if self.event_index is not None:
+            with self._append_lock():
+                self._sync_event_index(self._load_head()['count'])
+            low, high = 0, self.event_index.size
+            while low < high:
+                middle = (low + high) // 2
+                if self.event_index.offset_at(middle) < offset:
+                    low = middle + 1
+                else:
+                    high = middle
+            return low
+        
+        checkpoint = self._load_checkpoint(offset)
+        first_index = 0
+        for (base, size, path, compression), segment in zip(self._parts(), self._segments() + [None]):
+            if segment is not None and base + size <= offset:
+                first_index += segment['count']
+                continue
+            
+            start, count = 0, first_index
+            if checkpoint and checkpoint['offset'] >= base:
+                start, count = checkpoint['offset'] - base, checkpoint['index']
+            if compression != 'none':
+                return count + self.format.count_records(
+                    io.BytesIO(self._segment_bytes(path, compression)), start, offset - base
+                )
+            with open(path, 'rb') as f:
+                return count + self.format.count_records(f, start, offset - base)
+        return first_index
+    
+    def _locate_event(self, event_id: str) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+        """Find an event's (index, byte offset, parsed dict) by event_id"""
+        if self.event_index is not None:
+            with self._append_lock():
+                self._sync_event_index(self._load_head()['count'])
+            for index, offset in self.event_index.lookup(event_id):
+                event_dict = self._read_record_at(offset)
+                if event_dict['event_id'] == event_id:
+                    return index, offset, event_dict
+            return None
+        
+        for index, (offset, event_dict) in enumerate(self._iter_records()):
+            if event_dict['event_id'] == event_id:
+                return index, offset, event_dict
+        return None
+    
+    def get_event(self, event_id: str) -> Optional[OPTREvent]:
+        """
+        Fetch a single event by the event_id returned to callers
+        
+        With index=True this is a binary search of the sidecar index plus
+        one line read; otherwise the ledger is scanned.
+        """
+        located = self._locate_event(event_id)
+        if located is None:
+            return None
+        return OPTREvent(**located[2])
+    
+    def _sync_query_index(self, event_count: int) -> None:
+        """Bring the query indexes back in step with the first event_count events"""
+        if self.query_index.size == event_count:
+            return
+        if self.query_index.size > event_count:
+            self.query_index.reset()
+        
+        pending = []
+        records = self._iter_records(self.query_index.next_offset)
+        for offset, event_dict in records:
+            pending.append((offset, event_dict))
+            if self.query_index.size + len(pending) == event_count or len(pending) >= 4096:
+                # The next record (or EOF) marks where this batch ends
+                following = next(records, None)
+                next_offset = following[0] if following else self._ledger_size()
+                self.query_index.add(pending, next_offset)
+                pending = [following] if following else []
+                if self.query_index.size == event_count:
+                    break
+    
+    def _sync_stats(self, head: Dict[str, Any]) -> None:
+        """Bring the compliance aggregates in step with the chain head"""
+        if self.stats.data['count'] != head['count'] or self.stats.data['hash'] != head['hash']:
+            self.stats.refresh()
+        data = self.stats.data
+        if data['count'] == head['count'] and data['hash'] == head['hash']:
+            return
+        
+        # Counters are only extended when the event ending at their offset
+        # still carries the hash they were saved with
+        if data['count'] > head['count'] or data['size'] > head['size']:
+            self.stats.reset()
+        elif data['count']:
+            try:
+                last_event = self._read_last_event(end=data['size'])
+            except (ValueError, struct.error):
+                last_event = None  # Offset no longer on a record boundary
+            if not last_event or last_event['current_hash'] != data['hash']:
+                self.stats.reset()
+        
+        self._fold_stats(self.stats, head)
+        self.stats.save(head)
+    
+    def _fold_stats(self, stats: OPTRComplianceStats, head: Dict[str, Any]) -> None:
+        """Count the events after the counters' offset up to the head"""
+        pending = []
+        for _, event_dict in self._iter_records(stats.data['size']):
+            if stats.data['count'] + len(pending) == head['count']:
+                break
+            pending.append(OPTREvent(**event_dict))
+            if len(pending) >= 4096:
+                stats.add(pending, self.rule_set)
+                pending = []
+        stats.add(pending, self.rule_set)
+    
+    def compliance_stats(self) -> Dict[str, Any]:
+        """
+        Running compliance aggregates over the whole ledger
+        
+        Served from the .stats sidecar when enabled, which appends keep
+        current, so the cost does not grow with the ledger. Stale or foreign
+        aggregates are detected through their chain hash and rebuilt.
+        Without the sidecar (stats=False) the aggregates come from a full
+        scan up to the current head.
+        
+        Returns:
+            dict: count, compliant, non_compliant (decisions only),
+                non_decisions (NON_DECISION_EVENTS), rule_sets (registration
+                events), first_hash, hash and [events, compliant] buckets
+                per actor, event_type, rule and hour ('YYYY-MM-DDTHH', latest
+                STATS_HOURLY_BUCKETS hours)
+        """
+        if self.stats is None:
+            scan = OPTRComplianceStats(None)
+            self._fold_stats(scan, self._load_head())
+            stats = scan.data
+        else:
+            with self._append_lock():
+                self._sync_stats(self._load_head())
+                stats = copy.deepcopy(self.stats.data)
+        
+        stats['non_compliant'] = stats['count'] - stats['compliant'] - stats['non_decisions']
+        return stats
+    
+    def _iter_index_range(self, low: int, low_offset: int, high: int) -> Iterator[Dict[str, Any]]:
+        """Stream events [low, high) starting at low's byte offset"""
+        for index, (_, event_dict) in enumerate(self._iter_records(low_offset), low):
+            if index >= high:
+                return
+            yield event_dict
+    
+    def query(
+        self,
+        start: Optional[Any] = None,
+        end: Optional[Any] = None,
+        event_type: Optional[str] = None,
+        actor: Optional[str] = None,
+        is_compliant: Optional[bool] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[OPTREvent]:
+        """
+        Stream events matching every given filter, in chain order
+        
+        With query_index=True the filters are pushed down to the secondary
+        indexes: the sparse timestamp index bounds the scan and the posting
+        lists select candidate lines, so only matching events are parsed.
+        Without it the ledger is scanned and filtered.
+        
+        Args:
+            start: Inclusive lower timestamp bound (ISO string or datetime)
+            end: Exclusive upper timestamp bound (ISO string or datetime)
+            event_type: Match this event_type
+            actor: Match this actor
+            is_compliant: Match metadata.is_compliant of decision events
+                (NON_DECISION_EVENTS match neither True nor False)
+            limit: Stop after this many matches
+        """
+        if limit is not None and limit <= 0:
+            return
+        start_us = _timestamp_micros(start) if start is not None else None
+        end_us = _timestamp_micros(end) if end is not None else None
+        filters = {
+            field: value for field, value in (
+                ('event_type', event_type),
+                ('actor', actor),
+                ('is_compliant', None if is_compliant is None else ('true' if is_compliant else 'false'))
+            ) if value is not None
+        }
+        
+        def matches(event_dict: Dict[str, Any]) -> bool:
+            if start_us is not None or end_us is not None:
+                timestamp = _timestamp_micros(event_dict['timestamp'])
+                if start_us is not None and timestamp < start_us:
+                    return False
+                if end_us is not None and timestamp >= end_us:
+                    return False
+            fields = _query_fields(event_dict)
+            return all(fields[field] == value for field, value in filters.items())
+        
+        if self.query_index is not None:
+            with self._append_lock():
+                self._sync_query_index(self._load_head()['count'])
+            low, low_offset, high = self.query_index.time_bounds(start_us, end_us)
+            
+            if filters:
+                candidates = self.query_index.candidates(filters, low, high)
+                records = (self._read_record_at(offset) for _, offset in candidates)
+            else:
+                records = self._iter_index_range(low, low_offset, high)
+        else:
+            records = (event_dict for _, event_dict in self._iter_records())
+        
+        found = 0
+        for event_dict in records:
+            if not matches(event_dict):
+                continue
+            yield OPTREvent(**event_dict)
+            found += 1
+            if limit is not None and found >= limit:
+                return
+    
+    def _require_merkle_tree(self) -> OPTRMerkleTree:
+        if self.merkle_tree is None:
+            raise RuntimeError("Merkle index is disabled for this ledger (merkle=False)")
+        with self._append_lock():
+            self._sync_merkle_tree(self._load_head()['count'])
+        return self.merkle_tree
+    
+    def merkle_root(self, tree_size: Optional[int] = None) -> str:
+        """Merkle root over the first tree_size event hashes (defaults to all)"""
+        return self._require_merkle_tree().root(tree_size)
+    
+    def inclusion_proof(
+        self,
+        event_id: str,
+        tree_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Prove that a single event is included in the ledger
+        
+        The result carries everything verify_inclusion_proof needs, so an
+        auditor can check one decision without downloading the ledger.
+        """
+        tree = self._require_merkle_tree()
+        tree_size = tree.size if tree_size is None else tree_size
+        
+        located = self._locate_event(event_id)
+        if located is not None and located[0] < tree_size:
+            index, _, event_dict = located
+            return {
+                'event_id': event_id,
+                'event_hash': event_dict['current_hash'],
+                'index': index,
+                'tree_size': tree_size,
+                'root': tree.root(tree_size),
+                'proof': tree.inclusion_proof(index, tree_size)
+            }
+        
+        raise KeyError(f"Event {event_id} not found in the first {tree_size} events")
+    
+    def consistency_proof(
+        self,
+        old_size: int,
+        new_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Prove the ledger at new_size events extends the ledger at old_size"""
+        tree = self._require_merkle_tree()
+        new_size = tree.size if new_size is None else new_size
+        return {
+            'old_size': old_size,
+            'new_size': new_size,
+            'old_root': tree.root(old_size),
+            'new_root': tree.root(new_size),
+            'proof': tree.consistency_proof(old_size, new_size)
+        }
+    
+    def _split_ranges(self, path: str, start: int, end: int, chunks: int) -> List[Tuple[int, int]]:
+        """Split [start, end) of an uncompressed part into up to `chunks` record-aligned ranges"""
+        step = max((end - start) // max(chunks, 1), VERIFY_MIN_CHUNK)
+        boundaries = [start]
+        
+        with open(path, 'rb') as f:
+            position = start + step
+            while position < end:
+                # Move the boundary to the start of the next record
+                boundary = self.format.next_boundary(f, position, boundaries[-1])
+                if boundary >= end:
+                    break
+                boundaries.append(boundary)
+                position = boundary + step
+        
+        boundaries.append(end)
+        return list(zip(boundaries[:-1], boundaries[1:]))
+    
+    def _load_checkpoint(self, size: int) -> Optional[Dict[str, Any]]:
+        """
+        Return the latest checkpoint that still matches the ledger
+        
+        A checkpoint is trusted when the event ending at its byte offset
+        still carries the checkpointed hash; rewritten or truncated ledgers
+        fall back to older checkpoints, or to a full verification.
+        """
+        for line in reversed(self._read_checkpoint_lines()):
+            try:
+                checkpoint = json.loads(line)
+                if checkpoint['offset'] > size:
+                    continue
+                last_event = self._read_last_event(end=checkpoint['offset'])
+                if last_event and last_event['current_hash'] == checkpoint['hash']:
+                    return checkpoint
+            except (ValueError, KeyError, TypeError):
+                continue
+        return None
+    
+    def _read_checkpoint_lines(self) -> List[str]:
+        """The last CHECKPOINT_HISTORY checkpoint lines, oldest first"""
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return list(deque((line for line in f if line.strip()), maxlen=CHECKPOINT_HISTORY))
+        except FileNotFoundError:
+            return []
+    
+    def _save_checkpoint(self, index: int, offset: int, last_hash: str, hash_algorithm: str) -> None:
+        """
+        Record a verified (event index, byte offset, hash, next algorithm) checkpoint
+        
+        The sidecar is rewritten with only the latest CHECKPOINT_HISTORY
+        entries, so it stays small however often the ledger is verified.
+        """
+        if self.read_only:
+            return
+        lines = [line.rstrip('\n') + '\n' for line in self._read_checkpoint_lines()[-(CHECKPOINT_HISTORY - 1):]]
+        lines.append(json.dumps({
+            'index': index,
+            'offset': offset,
+            'hash': last_hash,
+            'hash_algorithm': hash_algorithm,
+            'verified_at': datetime.utcnow().isoformat() + 'Z'
+        }) + '\n')
+        tmp_path = self.checkpoint_path.with_name(
+            f"{self.checkpoint_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_path, 'w') as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    def verify_integrity(
+        self,
+        workers: Optional[int] = 1,
+        full: bool = False,
+        max_violations: Optional[int] = None,
+        deep: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Verify the cryptographic integrity of the entire ledger
+        
+        Recomputing each event's hash is independent work, so with more than
+        one worker the ledger is split into record-aligned byte ranges that are
+        hashed in a process pool. Only the previous_hash links between ranges
+        are then checked sequentially.
+        
+        Each successful verification persists a trusted checkpoint, and later
+        calls only re-check the events appended since the last one.
+        
+        Args:
+            workers: Number of verification processes (None for all cores)
+            full: Ignore checkpoints and re-verify from genesis
+            max_violations: Keep at most this many violation messages
+                (violation_count still counts all of them)
+            deep: Also check every blob payload referenced by the verified
+                events against its digest (the chain itself only commits
+                to the digests)
+        
+        Returns:
+            dict: Verification results including validity and any violations
+        """
+        # Read-only opens stop at the last complete record
+        size = self._load_head()['size'] if self.read_only else self._ledger_size()
+        if not size:
+            return {
+                'valid': True,
+                'total_events': 0,
+                'violations': [],
+                'violation_count': 0,
+                'verified_from': 0
+            }
+        
+        workers = workers or os.cpu_count() or 1
+        
+        # Resume from the last trusted checkpoint unless asked not to
+        checkpoint = None if full else self._load_checkpoint(size)
+        if checkpoint:
+            start = checkpoint['offset']
+            expected_previous_hash = checkpoint['hash']
+            total_events = checkpoint['index']
+            hash_algorithm = checkpoint.get('hash_algorithm', self.genesis_hash_algorithm)
+        else:
+            start = 0
+            expected_previous_hash = GENESIS_HASH
+            total_events = 0
+            hash_algorithm = self.genesis_hash_algorithm
+        verified_from = total_events
+        
+        # Sealed segments are verified one range each; segments wholly before
+        # the checkpoint are skipped. Only the first range knows its hash
+        # algorithm up front; later ones identify it from their first event
+        # and the stitching below checks it against the chain's migrations
+        blob_dir = str(self.blob_dir) if deep else None
+        ranges = []
+        for base, part_size, path, compression in self._parts():
+            if base + part_size <= start or base >= size:
+                continue
+            local_start = max(start - base, 0)
+            local_end = min(size - base, part_size)
+            if compression == 'none' and workers > 1:
+                # Several ranges per worker keeps the pool busy on uneven lines
+                ranges.extend(
+                    (path, range_start, range_end, compression, self.format.name, max_violations, None, blob_dir)
+                    for range_start, range_end in self._split_ranges(path, local_start, local_end, workers * 4)
+                )
+            else:
+                ranges.append(
+                    (path, local_start, local_end, compression, self.format.name, max_violations, None, blob_dir)
+                )
+        if ranges:
+            ranges[0] = ranges[0][:6] + (hash_algorithm, blob_dir)
+        
+        if len(ranges) > 1 and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunks = list(pool.map(_verify_chunk, *zip(*ranges)))
+        else:
+            chunks = [_verify_chunk(*task) for task in ranges]
+        
+        # Stitch the chain links across chunk borders
+        violations = []
+        violation_count = 0
+        
+        for chunk in chunks:
+            if not chunk['count']:
+                continue
+            
+            chunk_violations = chunk['violations']
+            violation_count += chunk['violation_count']
+            if chunk['first_previous_hash'] != expected_previous_hash:
+                chunk_violations = [(0, 'link')] + chunk_violations
+                violation_count += 1
+            # A first event matching no algorithm is already a hash violation
+            if (
+                chunk['first_hash_algorithm'] is not None
+                and chunk['first_hash_algorithm'] != hash_algorithm
+                and (0, 'hash') not in chunk_violations
+            ):
+                chunk_violations = chunk_violations + [(0, 'hash')]
+                violation_count += 1
+            
+            for local_idx, kind in chunk_violations:
+                if max_violations is not None and len(violations) >= max_violations:
+                    break
+                idx = total_events + local_idx
+                if kind == 'link':
+                    violations.append(f"Event {idx}: Previous hash mismatch")
+                elif kind == 'blob':
+                    violations.append(f"Event {idx}: Blob payload missing or corrupt")
+                else:
+                    violations.append(f"Event {idx}: Hash tampering detected")
+            
+            total_events += chunk['count']
+            expected_previous_hash = chunk['last_hash']
+            # None: no event of the chunk verified, so the algorithm carries on
+            hash_algorithm = chunk['next_hash_algorithm'] or hash_algorithm
+        
+        if not violation_count and total_events > verified_from:
+            self._save_checkpoint(total_events, size, expected_previous_hash, hash_algorithm)
+        
+        return {
+            'valid': violation_count == 0,
+            'total_events': total_events,
+            'violations': violations,
+            'violation_count': violation_count,
+            'verified_from': verified_from
+        }
+    
+    def verify_stream(
+        self,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+        progress_interval: float = 1.0,
+        max_violations: Optional[int] = 100,
+        stop_at_first_break: bool = False,
+        full: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Verify the chain in one sequential pass with constant memory
+        
+        Events are streamed and checked one at a time; only the running
+        hash, counters and at most max_violations records are kept, so a
+        large or badly corrupted ledger cannot exhaust memory.
+        
+        Args:
+            progress: Called every progress_interval seconds (and at the end)
+                with events, bytes, total_bytes, elapsed, events_per_second
+                and bytes_per_second
+            progress_interval: Seconds between progress callbacks
+            max_violations: Violation records to keep (None keeps all);
+                violation_count still counts every violation
+            stop_at_first_break: Stop at the first violation
+            full: Ignore checkpoints and re-verify from genesis
+        
+        A record that cannot be decoded is reported as a 'parse' violation
+        (found holds the error). JSONL verification resumes at the next
+        line without a link check against the unreadable record; binary
+        verification stops there, since the framing is no longer trusted.
+        
+        Returns:
+            dict: valid, total_events, verified_from, bytes_verified,
+                violation_count, violations (dicts with index, offset,
+                event_id, kind 'link'/'hash'/'parse', expected and found),
+                truncated (records were dropped) and stopped_early
+        """
+        # Read-only opens stop at the last complete record
+        size = self._load_head()['size'] if self.read_only else self._ledger_size()
+        checkpoint = None if full else self._load_checkpoint(size)
+        if checkpoint:
+            start = checkpoint['offset']
+            expected_previous_hash = checkpoint['hash']
+            index = checkpoint['index']
+            hash_algorithm = checkpoint.get('hash_algorithm', self.genesis_hash_algorithm)
+        else:
+            start = 0
+            expected_previous_hash = GENESIS_HASH
+            index = 0
+            hash_algorithm = self.genesis_hash_algorithm
+        verified_from = index
+        
+        violations = []
+        violation_count = 0
+        stopped_early = False
+        position = start
+        started = time.perf_counter()
+        next_report = started + progress_interval
+        
+        def report() -> None:
+            elapsed = time.perf_counter() - started
+            progress({
+                'events': index - verified_from,
+                'bytes': position - start,
+                'total_bytes': size - start,
+                'elapsed': elapsed,
+                'events_per_second': (index - verified_from) / elapsed if elapsed else 0.0,
+                'bytes_per_second': (position - start) / elapsed if elapsed else 0.0
+            })
+        
+        for offset, record in self._iter_records(start, size, raw=True):
+            if offset >= size:
+                position = size
+                break
+            position = offset
+            
+            try:
+                event_dict = self.format.decode(record)
+                event = OPTREvent(**event_dict)
+                computed = _calculate_event_hash(event, hash_algorithm)
+            except (ValueError, KeyError, TypeError, struct.error) as e:
+                violation_count += 1
+                if max_violations is None or len(violations) < max_violations:
+                    violations.append({
+                        'index': index,
+                        'offset': offset,
+                        'event_id': None,
+                        'kind': 'parse',
+                        'expected': None,
+                        'found': f"{type(e).__name__}: {e}"
+                    })
+                # The unreadable record's hash is unknown, so the next
+                # record's link cannot be checked
+                expected_previous_hash = None
+                index += 1
+                if stop_at_first_break or not self.format.resyncs:
+                    stopped_early = True
+                    break
+                continue
+            
+            found = []
+            if expected_previous_hash is not None and event.previous_hash != expected_previous_hash:
+                found.append(('link', expected_previous_hash, event.previous_hash))
+            if computed != event.current_hash:
+                found.append(('hash', computed, event.current_hash))
+            
+            for kind, expected, actual in found:
+                violation_count += 1
+                if max_violations is None or len(violations) < max_violations:
+                    violations.append({
+                        'index': index,
+                        'offset': offset,
+                        'event_id': event.event_id,
+                        'kind': kind,
+                        'expected': expected,
+                        'found': actual
+                    })
+            
+            expected_previous_hash = event.current_hash
+            hash_algorithm = _next_hash_algorithm(event, hash_algorithm)
+            index += 1
+            if found and stop_at_first_break:
+                stopped_early = True
+                break
+            
+            if progress is not None and not index % 1024 and time.perf_counter() >= next_report:
+                report()
+                next_report = time.perf_counter() + progress_interval
+        else:
+            position = size
+        
+        if progress is not None:
+            report()
+        
+        if not violation_count and index > verified_from:
+            self._save_checkpoint(index, size, expected_previous_hash, hash_algorithm)
+        
+        return {
+            'valid': violation_count == 0,
+            'total_events': index,
+            'verified_from': verified_from,
+            'bytes_verified': position - start,
+            'violation_count': violation_count,
+            'violations': violations,
+            'truncated': violation_count > len(violations),
+            'stopped_early': stopped_early
+        }
+    
+    def to_columns(self, chunk_size: int = 65536) -> OPTRColumns:
+        """
+        Export the ledger as columnar NumPy arrays
+        
+        Events are decoded once and written into a preallocated structured
+        array chunk by chunk; aggregates over the result (rates, windows,
+        percentiles) are then vectorized.
+        
+        Args:
+            chunk_size: Events converted per NumPy assignment
+            
+        Returns:
+            OPTRColumns: Structured array plus actor/event_type categories
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("Columnar export requires numpy")
+        
+        # Snapshot the event count; appends made while exporting are excluded
+        count = self._load_head()['count']
+        data = np.empty(count, dtype=COLUMN_DTYPE)
+        actors: Dict[str, int] = {}
+        event_types: Dict[str, int] = {}
+        
+        filled = 0
+        rows = []
+        for _, event_dict in self._iter_records():
+            if filled + len(rows) == count:
+                break
+            metadata = event_dict.get('metadata') or {}
+            is_decision = event_dict['event_type'] not in NON_DECISION_EVENTS
+            rows.append((
+                _timestamp_micros(event_dict['timestamp']),
+                actors.setdefault(event_dict['actor'], len(actors)),
+                event_types.setdefault(event_dict['event_type'], len(event_types)),
+                is_decision,
+                is_decision and bool(metadata.get('is_compliant', False)),
+                _payload_length(event_dict, 'input')
+            ))
+            if len(rows) == chunk_size:
+                data[filled:filled + len(rows)] = rows
+                filled += len(rows)
+                rows = []
+        if rows:
+            data[filled:filled + len(rows)] = rows
+            filled += len(rows)
+        
+        return OPTRColumns(data=data[:filled], actors=list(actors), event_types=list(event_types))
+    
+    def iter_events(self) -> Iterator[OPTREvent]:
+        """Stream events from the ledger in chain order with constant memory"""
+        for _, event_dict in self._iter_records():
+            yield OPTREvent(**event_dict)
+    
+    def _cursor_path(self, consumer: str) -> Path:
+        if not consumer or not all(c.isalnum() or c in '-_.' for c in consumer) or consumer[0] == '.':
+            raise ValueError(f"Invalid consumer name: {consumer!r}")
+        return self.consumer_dir / f"{consumer}.json"
+    
+    def _load_cursor(self, consumer: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._cursor_path(consumer), 'r') as f:
+                cursor = json.load(f)
+            return {
+                'offset': int(cursor['offset']),
+                'hash': str(cursor['hash']),
+                'hash_algorithm': cursor.get('hash_algorithm')
+            }
+        except FileNotFoundError:
+            return None
+    
+    def _save_cursor(self, consumer: str, cursor: Dict[str, Any]) -> None:
+        """Atomically persist a consumer's (byte offset, last hash, algorithm) position"""
+        self.consumer_dir.mkdir(parents=True, exist_ok=True)
+        path = self._cursor_path(consumer)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'offset': cursor['offset'],
+                'hash': cursor['hash'],
+                'hash_algorithm': cursor['hash_algorithm'],
+                'updated_at': datetime.utcnow().isoformat() + 'Z'
+            }, f)
+        os.replace(tmp_path, path)
+    
+    def _read_follow_batch(
+        self,
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], int, int]:
+        """
+        Read up to `limit` committed records starting at a logical offset
+        
+        Runs under the append lock so a rotation cannot move the active file
+        mid-read and no half-written record is returned.
+        
+        Returns:
+            tuple: (offset, event dict) records, the offset just past them
+                and the committed ledger size
+        """
+        with self._append_lock():
+            end = self._load_head()['size']
+            if offset > end:
+                raise ValueError(f"Cursor offset {offset} is past the end of the ledger ({end})")
+            
+            records = []
+            for record_offset, event_dict in self._iter_records(offset):
+                if record_offset >= end or len(records) == limit:
+                    return records, record_offset, end
+                records.append((record_offset, event_dict))
+            return records, end, end
+    
+    def follow(
+        self,
+        consumer: Optional[str] = None,
+        from_beginning: bool = True,
+        poll_interval: float = 0.5,
+        idle_timeout: Optional[float] = None,
+        commit_every: int = 100,
+        batch_size: int = 1024
+    ) -> Iterator[OPTREvent]:
+        """
+        Yield events as they are appended, resuming from a durable cursor
+        
+        A named consumer's position (logical byte offset plus the hash of the
+        last delivered event) is kept in <ledger>.consumers/<name>.json, so
+        independent consumers resume after a restart without rescanning
+        history. Offsets are logical, so segment rotation is transparent.
+        Every event is checked to link to its predecessor and to carry its
+        own hash before it is delivered.
+        
+        Delivery is at-least-once: an event is acknowledged when the caller
+        asks for the next one, and the cursor is saved every commit_every
+        acknowledged events and whenever the consumer catches up.
+        
+        Args:
+            consumer: Cursor name; None follows without persisting a position
+            from_beginning: Where a consumer without a cursor starts (genesis,
+                or the current end of the ledger)
+            poll_interval: Seconds between checks for new events
+            idle_timeout: Stop after this many seconds without new events
+            commit_every: Acknowledged events between cursor saves
+            batch_size: Events read per locked batch
+            
+        Raises:
+            ValueError: The cursor no longer matches the ledger, or the chain
+                is broken at the next event
+        """
+        if consumer and self.read_only:
+            raise RuntimeError("Consumer cursors cannot be persisted on a read-only ledger (read_only=True)")
+        cursor = self._load_cursor(consumer) if consumer else None
+        if cursor is None:
+            if from_beginning:
+                cursor = {'offset': 0, 'hash': GENESIS_HASH, 'hash_algorithm': self.genesis_hash_algorithm}
+            else:
+                with self._append_lock():
+                    head = self._load_head()
+                cursor = {'offset': head['size'], 'hash': head['hash'], 'hash_algorithm': head['hash_algorithm']}
+            if consumer:
+                self._save_cursor(consumer, cursor)
+        elif cursor['offset']:
+            last_event = self._read_last_event(end=cursor['offset'])
+            if not last_event or last_event['current_hash'] != cursor['hash']:
+                raise ValueError(f"Consumer {consumer!r} cursor does not match the ledger")
+            if cursor['hash_algorithm'] is None:
+                # Cursors written before pluggable hashing: derive from the last event
+                last_event = OPTREvent(**last_event)
+                cursor['hash_algorithm'] = _next_hash_algorithm(
+                    last_event,
+                    _match_hash_algorithm(last_event, self.genesis_hash_algorithm) or self.genesis_hash_algorithm
+                )
+        elif cursor['hash_algorithm'] is None:
+            cursor['hash_algorithm'] = self.genesis_hash_algorithm
+        
+        committed = dict(cursor)
+        acknowledged = 0
+        idle_since = time.monotonic()
+        try:
+            while True:
+                records, next_offset, end = self._read_follow_batch(cursor['offset'], batch_size)
+                for index, (offset, event_dict) in enumerate(records):
+                    event = OPTREvent(**event_dict)
+                    if event.previous_hash != cursor['hash']:
+                        raise ValueError(f"Chain broken at offset {offset}: previous hash mismatch")
+                    if _calculate_event_hash(event, cursor['hash_algorithm']) != event.current_hash:
+                        raise ValueError(f"Chain broken at offset {offset}: hash tampering detected")
+                    
+                    yield event
+                    
+                    # The caller asked for more, so the event is acknowledged
+                    cursor = {
+                        'offset': records[index + 1][0] if index + 1 < len(records) else next_offset,
+                        'hash': event.current_hash,
+                        'hash_algorithm': _next_hash_algorithm(event, cursor['hash_algorithm'])
+                    }
+                    acknowledged += 1
+                    if consumer and acknowledged >= commit_every:
+                        self._save_cursor(consumer, cursor)
+                        committed = cursor
+                        acknowledged = 0
+                
+                if records:
+                    idle_since = time.monotonic()
+                if cursor['offset'] < end:
+                    continue
+                
+                if consumer and cursor != committed:
+                    self._save_cursor(consumer, cursor)
+                    committed = cursor
+                    acknowledged = 0
+                if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    return
+                time.sleep(poll_interval)
+        finally:
+            if consumer and cursor != committed:
+                self._save_cursor(consumer, cursor)
+    
+    def tail(self, n: int) -> List[OPTREvent]:
+        """
+        Return the last n events in chain order
+        
+        Reads the ledger backwards in blocks, so the cost depends on n rather
+        than on the size of the ledger.
+        """
+        events = []
+        if n <= 0:
+            return events
+        
+        for _, event_dict in self._iter_records_reverse():
+            events.append(OPTREvent(**event_dict))
+            if len(events) == n:
+                break
+        
+        events.reverse()
+        return events
+    
+    def get_events(self, limit: Optional[int] = None) -> List[OPTREvent]:
+        """Retrieve events from the ledger"""
+        if limit:
+            return self.tail(limit)
+        return list(self.iter_events())
 
-@dataclass
-class OPTREvent:
-    """Single event in the OPTR ledger with cryptographic hash chain"""
-    timestamp: str
-    event_id: str
-    event_type: str
-    actor: str
-    action: str
-    input: Optional[str] = None
-    decision: Optional[str] = None
-    metadata: Optional[Dict[str, Any]] = None
-    previous_hash: str = ""
-    current_hash: str = ""
+
+def convert_ledger(source_path: str, target_path: str, record_format: str) -> Dict[str, Any]:
+    """
+    Rewrite a ledger in another on-disk record format
+    
+    Events are copied field for field, so every previous_hash/current_hash
+    in the target is identical to the source and the chain stays verifiable.
+    Sealed segments are flattened into a single active file; enable
+    segmentation on the target to re-seal it.
+    
+    Args:
+        source_path: Existing ledger (any format, detected from its meta record)
+        target_path: New ledger path; must not exist yet
+        record_format: Target format, one of LEDGER_FORMATS
+        
+    Returns:
+        dict: Target format, event count and last hash
+    """
+    if record_format not in LEDGER_FORMATS:
+        raise ValueError(f"Unknown ledger format: {record_format}")
+    if Path(target_path).exists():
+        raise ValueError(f"Target ledger already exists: {target_path}")
+    
+    source = OPTRLedger(source_path)
+    target = OPTRLedger(target_path, record_format=record_format, hash_algorithm=source.genesis_hash_algorithm)
+    
+    with target._append_lock():
+        with open(target.ledger_path, 'wb') as f:
+            pending = []
+            for event in source.iter_events():
+                pending.append(target.format.encode(event))
+                if len(pending) >= 4096:
+                    f.write(b''.join(pending))
+                    pending = []
+            f.write(b''.join(pending))
+            f.flush()
+            os.fsync(f.fileno())
+        
+        target._head = target._rebuild_head(target._ledger_size())
+        target._write_head_record(target._head)
+    
+    # Offloaded payloads are referenced by digest, so the blob store carries over as is
+    if source.blob_dir.exists():
+        shutil.copytree(source.blob_dir, target.blob_dir, dirs_exist_ok=True)
+    
+    return {
+        'format': record_format,
+        'events': target._head['count'],
+        'last_hash': target._head['hash']
+    }
 
 
-class OPTRLedger:
+def compare_ledgers(primary_path: str, replica_path: str) -> Dict[str, Any]:
     """
-    Cryptographically hash-chained ledger for Constitutional AI enforcement
+    Find the first event at which two replicas of a ledger diverge
     
-    Key Features:
-    - Tamper-evident: Any modification breaks the hash chain
-    - Append-only: Past events cannot be altered
-    - Verifiable: Third parties can validate integrity without system access
+    Each current_hash commits to the whole chain before it, so "the events
+    at position i match" holds up to the first difference and fails from
+    there on, which makes the divergence point binary-searchable:
+    - replicas with event indexes are searched by event index (any formats)
+    - replicas in the same format are bisected by byte offset, resyncing to
+      a record boundary at each probe
+    - otherwise they are scanned sequentially
+    Only O(log n) records are read in the first two cases. Edits that leave
+    current_hash untouched are not divergence here; verify_integrity
+    catches those.
+    
+    Both ledgers are opened read-only (read_only=True): nothing is truncated
+    or written, heads are read under a shared lock against multi-process
+    writers, and an event index is used only if it already covers the head.
+    
+    Args:
+        primary_path: Reference ledger
+        replica_path: Ledger to compare against it
+        
+    Returns:
+        dict: status ('identical', 'primary_behind', 'replica_behind' or
+            'diverged'), method, event counts, common_events (matching
+            leading events), divergence_index, the byte offset and hash of
+            the first unmatched record on each side, and probes (sample
+            points read)
     """
+    ledgers = []
+    heads = []
+    for path in (primary_path, replica_path):
+        ledger = OPTRLedger(path, read_only=True)
+        with ledger._snapshot_lock():
+            head = dict(ledger._load_head())
+        index_path = ledger._sidecar_path('.idx')
+        if head['count'] and index_path.exists():
+            event_index = OPTREventIndex(index_path)
+            try:
+                covered = (
+                    event_index.size >= head['count']
+                    and ledger._read_record_at(event_index.offset_at(head['count'] - 1))['current_hash'] == head['hash']
+                )
+            except (ValueError, KeyError, struct.error):
+                covered = False
+            if covered:
+                ledger.event_index = event_index
+        ledgers.append(ledger)
+        heads.append(head)
+    primary, replica = ledgers
+    primary_head, replica_head = heads
     
-    def __init__(self, ledger_path: str = "optr_ledger.jsonl"):
-        self.ledger_path = Path(ledger_path)
-        self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+    def hash_at(ledger: OPTRLedger, index: int) -> str:
+        return ledger._read_record_at(ledger.event_index.offset_at(index))['current_hash']
+    
+    probes = 0
+    offsets: List[Optional[int]] = [None, None]
+    if primary_head['count'] == replica_head['count'] and primary_head['hash'] == replica_head['hash']:
+        method = 'head'
+        common = primary_head['count']
+    
+    elif primary.event_index is not None and replica.event_index is not None:
+        method = 'index'
+        low, high = 0, min(primary_head['count'], replica_head['count'])
+        while low < high:
+            middle = (low + high) // 2
+            probes += 1
+            if hash_at(primary, middle) == hash_at(replica, middle):
+                low = middle + 1
+            else:
+                high = middle
+        common = low
+        offsets = [
+            ledger.event_index.offset_at(common) if common < head['count'] else None
+            for ledger, head in zip(ledgers, heads)
+        ]
+    
+    elif primary.format is replica.format:
+        method = 'bisect'
+        # Records starting before `low` match; a mismatch at `middle` means
+        # the first differing record starts at or before the next boundary
+        low, high, floor = 0, primary_head['size'], 0
+        while low < high:
+            middle = (low + high) // 2
+            probes += 1
+            offset, event_dict = primary._record_from(middle, floor, primary_head['size'])
+            if event_dict is not None:
+                replica_offset, replica_dict = replica._record_from(offset, floor, replica_head['size'])
+                if replica_dict is not None and replica_offset == offset and replica_dict['current_hash'] == event_dict['current_hash']:
+                    low, floor = offset + 1, offset
+                    continue
+            high = middle
         
-    def _get_last_hash(self) -> str:
-        """Retrieve the hash of the last event in the ledger"""
-        if not self.ledger_path.exists():
-            return "0" * 64  # Genesis hash
+        divergence = primary._record_from(low, floor, primary_head['size'])[0]
+        common = primary._count_before(divergence) if divergence < primary_head['size'] else primary_head['count']
+        offsets = [divergence if divergence < head['size'] else None for head in heads]
+    
+    else:
+        method = 'scan'
+        common = 0
+        limit = min(primary_head['count'], replica_head['count'])
+        records = itertools.zip_longest(
+            primary._iter_records(end=primary_head['size']),
+            replica._iter_records(end=replica_head['size']),
+            fillvalue=(None, None)
+        )
+        for (primary_offset, primary_dict), (replica_offset, replica_dict) in records:
+            if common == limit or primary_dict['current_hash'] != replica_dict['current_hash']:
+                break
+            common += 1
+        offsets = [
+            offset if common < head['count'] else None
+            for offset, head in zip((primary_offset, replica_offset), heads)
+        ]
+    
+    if common == primary_head['count'] == replica_head['count']:
+        status = 'identical'
+    elif common == primary_head['count']:
+        status = 'primary_behind'
+    elif common == replica_head['count']:
+        status = 'replica_behind'
+    else:
+        status = 'diverged'
+    
+    hashes = [
+        ledger._read_record_at(offset)['current_hash'] if offset is not None else None
+        for ledger, offset in zip(ledgers, offsets)
+    ]
+    
+    return {
+        'status': status,
+        'method': method,
+        'primary_events': primary_head['count'],
+        'replica_events': replica_head['count'],
+        'common_events': common,
+        'divergence_index': None if status == 'identical' else common,
+        'primary_offset': offsets[0],
+        'replica_offset': offsets[1],
+        'primary_hash': hashes[0],
+        'replica_hash': hashes[1],
+        'probes': probes
+    }
+
+
+class AsyncOPTRLedger:
+    """
+    asyncio front end for OPTRLedger
+    
+    Appends are queued on a bounded asyncio.Queue and drained by a single
+    writer task, which preserves submission order and merges queued
+    requests into one group commit. Hashing, file I/O and fsync run in a
+    thread pool so the event loop never blocks on them; a full queue makes
+    producers wait (backpressure). Events are written by OPTRLedger itself,
+    so the chain format is identical to the synchronous class.
+    """
+    
+    def __init__(
+        self,
+        ledger_path: str = "optr_ledger.jsonl",
+        max_pending: int = 1024,
+        max_batch: int = 256,
+        executor: Optional[ThreadPoolExecutor] = None,
+        **ledger_options: Any
+    ):
+        """
+        Args:
+            ledger_path: Ledger file, as for OPTRLedger
+            max_pending: Queued append requests before producers wait
+            max_batch: Upper bound on events merged into one group commit
+            executor: Thread pool for ledger I/O (a private one by default)
+            ledger_options: Further OPTRLedger keyword arguments
+        """
+        self.ledger = OPTRLedger(ledger_path, **ledger_options)
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=4, thread_name_prefix="optr-ledger")
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+    
+    async def __aenter__(self) -> "AsyncOPTRLedger":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def _run(self, function, *args, **kwargs):
+        """Run a blocking ledger call in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: function(*args, **kwargs))
+    
+    def _ensure_writer(self) -> asyncio.Queue:
+        # The queue and writer task belong to the loop of the first append
+        if self._writer is None or self._writer.done():
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+        return self._queue
+    
+    async def _write_loop(self) -> None:
+        """Single writer: drain queued requests into ordered group commits"""
+        queue = self._queue
+        carry = None
+        while True:
+            requests = [carry or await queue.get()]
+            carry = None
+            durability = requests[0][1]
+            size = len(requests[0][0])
             
-        with open(self.ledger_path, 'r') as f:
-            lines = f.readlines()
-            if not lines:
-                return "0" * 64
-                
-            last_event = json.loads(lines[-1])
-            return last_event['current_hash']
+            # Merge what is already queued, keeping one durability per commit
+            while size < self.max_batch and not queue.empty():
+                request = queue.get_nowait()
+                if request[1] != durability:
+                    carry = request
+                    break
+                requests.append(request)
+                size += len(request[0])
+            
+            try:
+                await self._commit(requests, durability)
+            finally:
+                for _ in requests:
+                    queue.task_done()
     
-    def _calculate_hash(self, event: OPTREvent) -> str:
-        """Calculate SHA-256 hash for an event"""
-        # Create event dict without current_hash
-        event_dict = asdict(event)
-        event_dict.pop('current_hash', None)
-        
-        # Hash the previous hash + event data
-        hash_input = event.previous_hash + json.dumps(event_dict, sort_keys=True)
-        return hashlib.sha256(hash_input.encode()).hexdigest()
+    async def _commit(self, requests: List[Tuple], durability: Optional[str]) -> None:
+        """Write merged requests as one batch and resolve their futures"""
+        batch = [spec for specs, _, _ in requests for spec in specs]
+        try:
+            events = await self._run(self.ledger.append_events, batch, durability)
+        except InvalidEventError as e:
+            # Malformed events are rejected before anything is written, so
+            # retry the requests one by one to fail only the offending ones.
+            # Any other error may come after the write and is never retried
+            if len(requests) > 1:
+                for request in requests:
+                    await self._commit([request], durability)
+                return
+            self._resolve(requests, exception=e)
+        except Exception as e:
+            self._resolve(requests, exception=e)
+        else:
+            self._resolve(requests, events=events)
     
-    def append_event(
+    @staticmethod
+    def _resolve(
+        requests: List[Tuple],
+        events: Optional[List[OPTREvent]] = None,
+        exception: Optional[BaseException] = None
+    ) -> None:
+        position = 0
+        for specs, _, future in requests:
+            if future.done():
+                pass  # The caller stopped waiting
+            elif exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(events[position:position + len(specs)])
+            position += len(specs)
+    
+    async def append_events(
+        self,
+        batch: List[Dict[str, Any]],
+        durability: Optional[str] = None
+    ) -> List[OPTREvent]:
+        """Append a batch of events; see OPTRLedger.append_events"""
+        if not batch:
+            return []
+        queue = self._ensure_writer()
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((list(batch), durability, future))
+        return await future
+    
+    async def append_event(
         self,
         event_type: str,
         actor: str,
@@ -85,90 +3876,483 @@ class OPTRLedger:
         decision: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None
     ) -> OPTREvent:
+        """Append a single event; resolves once it is written"""
+        events = await self.append_events([{
+            'event_type': event_type,
+            'actor': actor,
+            'action': action,
+            'input_data': input_data,
+            'decision': decision,
+            'metadata': metadata
+        }])
+        return events[0]
+    
+    async def get_event(self, event_id: str) -> Optional[OPTREvent]:
+        return await self._run(self.ledger.get_event, event_id)
+    
+    async def get_events(self, limit: Optional[int] = None) -> List[OPTREvent]:
+        return await self._run(self.ledger.get_events, limit)
+    
+    async def tail(self, n: int) -> List[OPTREvent]:
+        return await self._run(self.ledger.tail, n)
+    
+    async def verify_integrity(self, **options: Any) -> Dict[str, Any]:
+        """Verify the chain off the event loop; see OPTRLedger.verify_integrity"""
+        return await self._run(self.ledger.verify_integrity, **options)
+    
+    async def flush(self) -> None:
+        """Wait until every queued append has been written"""
+        if self._queue is not None:
+            await self._queue.join()
+    
+    async def close(self) -> None:
+        """Flush pending appends and stop the writer task"""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        if self._own_executor:
+            self._executor.shutdown(wait=False)
+
+
+class ShardedOPTRLedger:
+    """
+    OPTR ledger split into independent hash-chained shards plus a root chain
+    
+    Events are routed by a stable hash of a shard key (a tenant, or any
+    other key) to one of N OPTRLedger shards. Each shard has its own file,
+    head and lock, so appends to different shards never wait on each other.
+    The root ledger at ledger_path is a chain of anchor events, each
+    committing the (event count, head hash) of every shard; an anchored
+    shard prefix cannot be rewritten or truncated without disagreeing with
+    the root chain.
+    
+    Shards live in <ledger>.shards/. The shard count is recorded in the
+    root's meta record, since changing it would reroute keys.
+    """
+    
+    def __init__(
+        self,
+        ledger_path: str = "optr_ledger.jsonl",
+        shards: int = 8,
+        anchor_every: Optional[int] = 1000,
+        **ledger_options: Any
+    ):
         """
-        Append a new event to the ledger with cryptographic hash chain
+        Args:
+            ledger_path: Root (anchor chain) ledger file
+            shards: Number of shards; must match an existing sharded ledger
+            anchor_every: Anchor the shard heads after this many appends
+                through this instance (None anchors only on anchor())
+            ledger_options: Further OPTRLedger keyword arguments for the shards
+        """
+        if shards < 1:
+            raise ValueError("A sharded ledger needs at least one shard")
         
-        This creates a tamper-evident record that can be independently verified
-        by third parties, enabling scalable oversight without system access.
+        root_options = {
+            option: ledger_options[option]
+            for option in ('durability', 'multiprocess')
+            if option in ledger_options
+        }
+        self.root = OPTRLedger(ledger_path, **root_options)
+        meta = self.root._read_meta()
+        if 'shards' not in meta:
+            if self.root._load_head()['count']:
+                raise ValueError(f"{ledger_path} is not a sharded ledger")
+            meta['shards'] = shards
+            self.root._write_meta(meta)
+        elif meta['shards'] != shards:
+            raise ValueError(
+                f"{ledger_path} has {meta['shards']} shards; changing the count would reroute keys"
+            )
+        
+        shard_dir = self.root._sidecar_path('.shards')
+        suffix = self.root.ledger_path.suffix or '.jsonl'
+        self.shards = [
+            OPTRLedger(str(shard_dir / f"shard-{number:04d}{suffix}"), **ledger_options)
+            for number in range(shards)
+        ]
+        self.anchor_every = anchor_every
+        self._anchor_lock = threading.Lock()
+        self._since_anchor = 0
+    
+    def shard_for(self, shard_key: str) -> int:
+        """Shard number for a key (stable across processes and restarts)"""
+        digest = hashlib.sha256(str(shard_key).encode()).digest()
+        return int.from_bytes(digest[:8], 'big') % len(self.shards)
+    
+    def append_event(
+        self,
+        event_type: str,
+        actor: str,
+        action: str,
+        input_data: Optional[str] = None,
+        decision: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        shard_key: Optional[str] = None
+    ) -> Tuple[int, OPTREvent]:
         """
-        # Get previous hash to maintain chain
-        previous_hash = self._get_last_hash()
+        Append an event to the shard its key routes to
         
-        # Create event
-        event = OPTREvent(
-            timestamp=datetime.utcnow().isoformat() + 'Z',
-            event_id=f"evt_{int(datetime.utcnow().timestamp() * 1000)}",
-            event_type=event_type,
-            actor=actor,
-            action=action,
-            input=input_data,
-            decision=decision,
-            metadata=metadata or {},
-            previous_hash=previous_hash,
-            current_hash=""  # Will be calculated
-        )
+        Args:
+            shard_key: Routing key, e.g. a tenant ID (the actor by default)
+        
+        Returns:
+            tuple: (shard number, appended event)
+        """
+        shard, events = self.append_events([{
+            'event_type': event_type,
+            'actor': actor,
+            'action': action,
+            'input_data': input_data,
+            'decision': decision,
+            'metadata': metadata
+        }], shard_key=actor if shard_key is None else shard_key)
+        return shard, events[0]
+    
+    def append_events(
+        self,
+        batch: List[Dict[str, Any]],
+        shard_key: str,
+        durability: Optional[str] = None
+    ) -> Tuple[int, List[OPTREvent]]:
+        """
+        Append a batch to one shard with a single group commit
         
-        # Calculate hash
-        event.current_hash = self._calculate_hash(event)
+        Returns:
+            tuple: (shard number, appended events in chain order)
+        """
+        shard = self.shard_for(shard_key)
+        events = self.shards[shard].append_events(batch, durability)
         
-        # Append to ledger
-        with open(self.ledger_path, 'a') as f:
-            f.write(json.dumps(asdict(event)) + '\n')
+        if self.anchor_every is not None and events:
+            with self._anchor_lock:
+                self._since_anchor += len(events)
+                due = self._since_anchor >= self.anchor_every
+            if due:
+                self.anchor()
+        return shard, events
+    
+    def register_rule_set(self, rules: List[str], shard_key: str) -> str:
+        """Register a rule set in the shard a key routes to; see OPTRLedger.register_rule_set"""
+        return self.shards[self.shard_for(shard_key)].register_rule_set(rules)
+    
+    def constitutional_rules(self, event: OPTREvent) -> Optional[List[str]]:
+        """
+        Rules a decision was checked against, inline or referenced by hash
         
-        return event
+        References are content hashes, so a registration found in any shard
+        resolves them; sidecars are only rebuilt if no shard knows the hash.
+        """
+        metadata = event.metadata or {}
+        if 'constitutional_rules_ref' not in metadata:
+            return metadata.get('constitutional_rules')
+        for rebuild in (False, True):
+            for shard in self.shards:
+                rules = shard.rule_set(metadata['constitutional_rules_ref'], rebuild=rebuild)
+                if rules is not None:
+                    return rules
+        return None
     
-    def verify_integrity(self) -> Dict[str, Any]:
+    def _last_anchor(self) -> Optional[OPTREvent]:
+        for event in self.root.tail(1):
+            if event.event_type == SHARD_ANCHOR_EVENT:
+                return event
+        return None
+    
+    def anchor(self) -> Optional[OPTREvent]:
         """
-        Verify the cryptographic integrity of the entire ledger
+        Commit every shard's current head to the root chain
         
         Returns:
-            dict: Verification results including validity and any violations
+            OPTREvent: The anchor event, or None if no shard has changed
+                since the last anchor
         """
-        if not self.ledger_path.exists():
-            return {
-                'valid': True,
-                'total_events': 0,
-                'violations': []
-            }
+        heads = []
+        for shard in self.shards:
+            with shard._append_lock():
+                head = shard._load_head()
+            heads.append({'count': head['count'], 'hash': head['hash']})
         
-        violations = []
-        expected_previous_hash = "0" * 64
+        with self._anchor_lock:
+            self._since_anchor = 0
+            last_anchor = self._last_anchor()
+            if last_anchor is not None and last_anchor.metadata['heads'] == heads:
+                return None
+            return self.root.append_event(
+                event_type=SHARD_ANCHOR_EVENT,
+                actor="optr_sharded_ledger",
+                action="anchor_shard_heads",
+                metadata={'shards': len(heads), 'heads': heads}
+            )
+    
+    def _check_anchored_head(self, shard: OPTRLedger, anchored: Dict[str, Any]) -> Optional[str]:
+        """Check that a shard still contains the head recorded by an anchor"""
+        with shard._append_lock():
+            head = dict(shard._load_head())
+            if shard.event_index is not None:
+                shard._sync_event_index(head['count'])
         
-        with open(self.ledger_path, 'r') as f:
-            events = [json.loads(line) for line in f if line.strip()]
+        if head['count'] < anchored['count']:
+            return f"Truncated to {head['count']} events below the {anchored['count']} anchored"
+        if not anchored['count']:
+            return None
         
-        for idx, event_dict in enumerate(events):
-            # Check previous hash matches
-            if event_dict['previous_hash'] != expected_previous_hash:
-                violations.append(f"Event {idx}: Previous hash mismatch")
-            
-            # Verify current hash
-            event = OPTREvent(**event_dict)
-            event.current_hash = ""  # Reset for calculation
-            calculated_hash = self._calculate_hash(event)
-            
-            if calculated_hash != event_dict['current_hash']:
-                violations.append(f"Event {idx}: Hash tampering detected")
-            
-            expected_previous_hash = event_dict['current_hash']
+        # Anchors are recent, so walking back from the head is short
+        if shard.event_index is not None:
+            event_dict = shard._read_record_at(shard.event_index.offset_at(anchored['count'] - 1))
+        else:
+            records = shard._iter_records_reverse(head['size'])
+            event_dict = next(itertools.islice(records, head['count'] - anchored['count'], None), (None, None))[1]
+        if event_dict is None or event_dict['current_hash'] != anchored['hash']:
+            return f"Event {anchored['count'] - 1}: Does not match the anchored head"
+        return None
+    
+    def verify_integrity(self, workers: Optional[int] = 1, full: bool = False) -> Dict[str, Any]:
+        """
+        Verify every shard, the root chain and the latest anchor
+        
+        Each anchored head commits to its whole shard prefix, so checking
+        the latest anchor against the shards covers the earlier ones.
+        
+        Returns:
+            dict: Combined validity, total_events and prefixed violations,
+                plus the root and per-shard results
+        """
+        shard_results = [shard.verify_integrity(workers=workers, full=full) for shard in self.shards]
+        root_result = self.root.verify_integrity(full=full)
+        
+        violations = [f"Root: {violation}" for violation in root_result['violations']]
+        violation_count = root_result['violation_count']
+        for number, result in enumerate(shard_results):
+            violations.extend(f"Shard {number}: {violation}" for violation in result['violations'])
+            violation_count += result['violation_count']
+        
+        anchor = self._last_anchor()
+        anchored_events = 0
+        if anchor is not None:
+            for number, (shard, anchored) in enumerate(zip(self.shards, anchor.metadata['heads'])):
+                problem = self._check_anchored_head(shard, anchored)
+                if problem:
+                    violations.append(f"Shard {number}: {problem}")
+                    violation_count += 1
+                anchored_events += anchored['count']
         
         return {
-            'valid': len(violations) == 0,
-            'total_events': len(events),
-            'violations': violations
+            'valid': violation_count == 0,
+            'total_events': sum(result['total_events'] for result in shard_results),
+            'violations': violations,
+            'violation_count': violation_count,
+            'verified_from': sum(result['verified_from'] for result in shard_results),
+            'anchored_events': anchored_events,
+            'root': root_result,
+            'shards': shard_results
         }
     
+    def get_event(self, event_id: str, shard: Optional[int] = None) -> Optional[OPTREvent]:
+        """
+        Fetch an event by event_id
+        
+        Event IDs are unique within a shard only; pass the shard number
+        returned by append_event to disambiguate, otherwise shards are
+        searched in order.
+        """
+        ledgers = self.shards if shard is None else [self.shards[shard]]
+        for ledger in ledgers:
+            event = ledger.get_event(event_id)
+            if event is not None:
+                return event
+        return None
+    
+    def query(self, limit: Optional[int] = None, **filters: Any) -> Iterator[OPTREvent]:
+        """Stream events matching OPTRLedger.query filters from all shards, in timestamp order"""
+        merged = heapq.merge(
+            *(shard.query(limit=limit, **filters) for shard in self.shards),
+            key=lambda event: _timestamp_micros(event.timestamp)
+        )
+        return itertools.islice(merged, limit)
+    
+    def tail(self, n: int) -> List[OPTREvent]:
+        """Return the last n events across all shards in timestamp order"""
+        events = heapq.merge(
+            *(shard.tail(n) for shard in self.shards),
+            key=lambda event: _timestamp_micros(event.timestamp)
+        )
+        return list(events)[-n:] if n > 0 else []
+    
     def get_events(self, limit: Optional[int] = None) -> List[OPTREvent]:
-        """Retrieve events from the ledger"""
-        if not self.ledger_path.exists():
-            return []
+        """Retrieve events from all shards in timestamp order"""
+        if limit:
+            return self.tail(limit)
+        return list(self.query())
+    
+    def compliance_stats(self) -> Dict[str, Any]:
+        """
+        Compliance aggregates summed over all shards
         
-        with open(self.ledger_path, 'r') as f:
-            events = [OPTREvent(**json.loads(line)) for line in f if line.strip()]
+        Returns:
+            dict: count, compliant, non_compliant and merged buckets as for
+                OPTRLedger.compliance_stats, plus the per-shard stats
+        """
+        shard_stats = [shard.compliance_stats() for shard in self.shards]
+        merged = {
+            'count': 0,
+            'compliant': 0,
+            'non_compliant': 0,
+            'non_decisions': 0,
+            'rule_sets': 0,
+            'actors': {},
+            'event_types': {},
+            'rules': {},
+            'hourly': {},
+            'shards': shard_stats
+        }
+        for stats in shard_stats:
+            for counter in ('count', 'compliant', 'non_compliant', 'non_decisions', 'rule_sets'):
+                merged[counter] += stats[counter]
+            for field in ('actors', 'event_types', 'rules', 'hourly'):
+                for name, (events, compliant) in stats[field].items():
+                    bucket = merged[field].setdefault(name, [0, 0])
+                    bucket[0] += events
+                    bucket[1] += compliant
+        for hour in sorted(merged['hourly'])[:-STATS_HOURLY_BUCKETS]:
+            del merged['hourly'][hour]
+        return merged
+
+
+class DecisionCache:
+    """
+    Cache of constitutional decisions keyed by prompt, rule set and model
+
+    An in-memory LRU with a TTL, optionally backed by a SQLite file so that
+    entries survive restarts. Entries carry the decision and a reference to
+    the ledger event that first recorded it.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl: Optional[float] = 3600.0,
+        path: Optional[str] = None
+    ):
+        """
+        Args:
+            max_entries: Entries kept in memory before the least recently
+                used one is evicted
+            ttl: Seconds an entry stays valid (None keeps entries forever)
+            path: SQLite file of the persistent tier (None keeps the cache
+                in memory only)
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = Path(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS decisions ("
+                "key TEXT PRIMARY KEY, entry TEXT NOT NULL, expires REAL)"
+            )
+            self._db.commit()
+    
+    @staticmethod
+    def key(prompt: str, rule_set_hash: str, model: str) -> str:
+        """
+        Cache key of a check
         
-        if limit:
-            return events[-limit:]
-        return events
+        The prompt is NFC-normalized with surrounding and repeated
+        whitespace collapsed, so trivially different spellings share a key.
+        """
+        normalized = " ".join(unicodedata.normalize('NFC', prompt).split())
+        return hashlib.sha256(
+            json.dumps([normalized, rule_set_hash, model]).encode()
+        ).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the live entry for key, promoting disk hits into memory"""
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                expires, entry = cached
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+            
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT entry, expires FROM decisions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] is None or row[1] > now:
+                        entry = json.loads(row[0])
+                        self._remember(key, row[1], entry)
+                        self.hits += 1
+                        return entry
+                    self._db.execute("DELETE FROM decisions WHERE key = ?", (key,))
+                    self._db.commit()
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        """Store entry under key in memory and in the persistent tier"""
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO decisions (key, entry, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(entry, sort_keys=True), expires)
+                )
+                self._db.commit()
+    
+    def _remember(self, key: str, expires: Optional[float], entry: Dict[str, Any]) -> None:
+        """Insert into the memory tier, evicting least recently used entries"""
+        self._entries[key] = (expires, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM decisions")
+                self._db.commit()
+    
+    def close(self) -> None:
+        """Close the persistent tier"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the number of entries held in memory"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries)
+        }
 
 
 class ConstitutionalAIEnforcer:
@@ -183,10 +4367,24 @@ class ConstitutionalAIEnforcer:
     def __init__(
         self,
         api_key: Optional[str] = None,
-        ledger_path: str = "constitutional_ai_ledger.jsonl"
+        ledger_path: str = "constitutional_ai_ledger.jsonl",
+        shards: Optional[int] = None,
+        blob_threshold: Optional[int] = None,
+        model: str = DEFAULT_MODEL,
+        cache: Optional[DecisionCache] = None,
+        stats: bool = False
     ):
         self.api_key = api_key or os.environ.get('ANTHROPIC_API_KEY')
-        self.ledger = OPTRLedger(ledger_path)
+        self.model = model
+        # Repeated checks are answered from the cache but still logged
+        self.cache = cache
+        # With shards, decisions are routed by tenant to independent chains;
+        # prompts and decisions above blob_threshold bytes go to the blob store.
+        # With stats, reports read running aggregates instead of scanning
+        if shards:
+            self.ledger = ShardedOPTRLedger(ledger_path, shards=shards, stats=stats, blob_threshold=blob_threshold)
+        else:
+            self.ledger = OPTRLedger(ledger_path, stats=stats, blob_threshold=blob_threshold)
         
         if self.api_key and ANTHROPIC_AVAILABLE:
             self.client = anthropic.Anthropic(api_key=self.api_key)
@@ -197,7 +4395,8 @@ class ConstitutionalAIEnforcer:
         self,
         prompt: str,
         constitutional_rules: List[str],
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        tenant: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Enforce Constitutional AI check before allowing an action
@@ -209,46 +4408,91 @@ class ConstitutionalAIEnforcer:
             prompt: The input to evaluate
             constitutional_rules: List of constitutional constraints to enforce
             context: Additional context for the decision
+            tenant: Caller the decision is recorded for; selects the shard
+                of a sharded ledger (the prompt is hashed when omitted)
             
         Returns:
             dict: Decision result with enforcement metadata
         """
-        # Build constitutional prompt
-        constitutional_prompt = self._build_constitutional_prompt(
-            prompt, constitutional_rules
-        )
+        # The rule set is registered once in the tamper-evident ledger and
+        # referenced by its content hash
+        sharded = isinstance(self.ledger, ShardedOPTRLedger)
+        shard_key = prompt if tenant is None else tenant
+        if sharded:
+            rule_set_hash = self.ledger.register_rule_set(constitutional_rules, shard_key)
+        else:
+            rule_set_hash = self.ledger.register_rule_set(constitutional_rules)
+        
+        cache_key = None
+        cached = None
+        if self.cache is not None:
+            cache_key = self.cache.key(
+                prompt, rule_set_hash, self.model if self.client else "simulated"
+            )
+            cached = self.cache.get(cache_key)
         
-        # Get decision from Claude (or simulate if API unavailable)
-        if self.client:
-            decision = self._get_claude_decision(constitutional_prompt)
+        if cached is not None:
+            decision = cached['decision']
         else:
-            decision = self._simulate_constitutional_decision(prompt, constitutional_rules)
+            # Build constitutional prompt
+            constitutional_prompt = self._build_constitutional_prompt(
+                prompt, constitutional_rules
+            )
+            
+            # Get decision from Claude (or simulate if API unavailable)
+            if self.client:
+                decision = self._get_claude_decision(constitutional_prompt)
+            else:
+                decision = self._simulate_constitutional_decision(prompt, constitutional_rules)
         
         # Determine if compliant
         is_compliant = decision.startswith("COMPLIANT") or "APPROVED" in decision
         
-        # Log to tamper-evident ledger
-        event = self.ledger.append_event(
-            event_type="constitutional_ai_check",
-            actor="anthropic_claude" if self.client else "simulated_enforcer",
-            action="enforce_constitutional_constraint",
-            input_data=prompt,
-            decision=decision,
-            metadata={
-                'constitutional_rules': constitutional_rules,
-                'is_compliant': is_compliant,
-                'context': context or {},
-                'simulated': not bool(self.client)
-            }
-        )
+        metadata = {
+            'constitutional_rules_ref': rule_set_hash,
+            'is_compliant': is_compliant,
+            'context': context or {},
+            'simulated': not bool(self.client)
+        }
+        if tenant is not None:
+            metadata['tenant'] = tenant
+        if cached is not None:
+            # Point at the event that recorded the original decision
+            metadata['cache_hit'] = True
+            metadata['cached_event'] = cached['event']
+        event_fields = {
+            'event_type': "constitutional_ai_check",
+            'actor': "anthropic_claude" if self.client else "simulated_enforcer",
+            'action': "enforce_constitutional_constraint",
+            'input_data': prompt,
+            'decision': decision,
+            'metadata': metadata
+        }
         
-        return {
+        shard = None
+        if sharded:
+            shard, event = self.ledger.append_event(**event_fields, shard_key=shard_key)
+        else:
+            event = self.ledger.append_event(**event_fields)
+        
+        # API errors are never cached; the next check retries the call
+        if cache_key is not None and cached is None and not decision.startswith("ERROR"):
+            reference = {'event_id': event.event_id, 'hash': event.current_hash}
+            if shard is not None:
+                reference['shard'] = shard
+            self.cache.put(cache_key, {'decision': decision, 'event': reference})
+        
+        result = {
             'compliant': is_compliant,
             'decision': decision,
             'event_id': event.event_id,
             'hash': event.current_hash,
-            'enforcement_verified': True
+            'enforcement_verified': True,
+            'cache_hit': cached is not None
         }
+        if shard is not None:
+            result['shard'] = shard
+        return result
     
     def _simulate_constitutional_decision(
         self, prompt: str, rules: List[str]
@@ -297,7 +4541,7 @@ Be rigorous and specific about which principle is violated if non-compliant.
         """Get decision from Claude API"""
         try:
             message = self.client.messages.create(
-                model="claude-sonnet-4-5-20250929",
+                model=self.model,
                 max_tokens=256,
                 messages=[
                     {"role": "user", "content": prompt}
@@ -316,16 +4560,19 @@ Be rigorous and specific about which principle is violated if non-compliant.
         constraints, without requiring access to model internals.
         """
         verification = self.ledger.verify_integrity()
-        events = self.ledger.get_events()
+        # Bookkeeping events are rare; skip them among the latest events
+        recent_events = [
+            event for event in self.ledger.tail(10)
+            if event.event_type not in NON_DECISION_EVENTS
+        ][-5:]
         
-        if not events:
+        if not recent_events:
             return "No compliance events recorded"
         
-        compliant = sum(
-            1 for e in events 
-            if e.metadata and e.metadata.get('is_compliant', False)
-        )
-        non_compliant = len(events) - compliant
+        stats = self.ledger.compliance_stats()
+        compliant = stats['compliant']
+        non_compliant = stats['non_compliant']
+        total = compliant + non_compliant
         
         report = f"""
 Constitutional AI Compliance Report
@@ -338,28 +4585,50 @@ Hash Chain Violations: {len(verification['violations'])}
 Compliance Summary:
 - Compliant Decisions: {compliant}
 - Non-Compliant Decisions: {non_compliant}
-- Compliance Rate: {(compliant/len(events)*100):.1f}%
+- Compliance Rate: {(compliant/total*100):.1f}%
 
 Recent Events (Last 5):
 """
         
-        for event in events[-5:]:
+        for event in recent_events:
             compliance = event.metadata.get('is_compliant', False) if event.metadata else False
             status = "✓ COMPLIANT" if compliance else "✗ NON-COMPLIANT"
+            rules = self.ledger.constitutional_rules(event) or []
             
             report += f"""
 Event ID: {event.event_id}
 Time: {event.timestamp}
 Status: {status}
+Rules Checked: {len(rules)}
 Hash: {event.current_hash[:32]}...
 """
         
-        report += f"""
+        if isinstance(self.ledger, ShardedOPTRLedger):
+            report += f"""
 Cryptographic Verification:
-- First Hash: {events[0].current_hash[:32]}...
-- Last Hash: {events[-1].current_hash[:32]}...
+- Shards: {len(self.ledger.shards)}
+- Anchored Events: {verification['anchored_events']}
+- Root Anchor Hash: {self.ledger.root._get_last_hash()[:32]}...
 - Chain Integrity: {'✓ Verified' if verification['valid'] else '✗ Broken'}
-
+"""
+        else:
+            report += f"""
+Cryptographic Verification:
+- First Hash: {stats['first_hash'][:32]}...
+- Last Hash: {recent_events[-1].current_hash[:32]}...
+- Chain Integrity: {'✓ Verified' if verification['valid'] else '✗ Broken'}
+"""
+        
+        if self.cache is not None:
+            cache_stats = self.cache.stats()
+            report += f"""
+Decision Cache:
+- Hits: {cache_stats['hits']}
+- Misses: {cache_stats['misses']}
+- Hit Rate: {cache_stats['hit_rate'] * 100:.1f}%
+"""
+        
+        report += """
 This ledger provides cryptographic proof of Constitutional AI enforcement.
 Any tampering with past decisions will break the hash chain.
 """